@@ -0,0 +1,369 @@
+"""Headless HTTP API over the screen's bars, indicators, portfolio and trading.
+
+    uvicorn api:app --port 8000
+
+Bar and series endpoints answer JSON by default; pass ?format=arrow (Arrow
+IPC stream) or ?format=msgpack, or the matching Accept header, for compact
+binary columns.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+from utils.bars import COLUMNS
+from utils.config import (
+    API_CACHE_SECONDS,
+    API_SIGNAL_CACHE_SIZE,
+    API_TOKEN,
+    EXCHANGE_MAPPINGS,
+    MARKETS,
+    TIMEFRAMES,
+)
+from utils.db_utils import add_order, ensure_db, get_recent_transactions
+from utils.indicator_graph import NODES, node_values
+from utils.intervals import get_interval
+from utils.market_data import fetch_market_symbols, get_full_symbol, load_dataset
+from utils.portfolio import lookup_price, value_portfolio
+from utils.trading import execute_trade
+from utils.user_store import login
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are optional
+    pa = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_TYPE = "application/msgpack"
+
+# (dataset key, version, indicator) -> signals
+_signal_cache = OrderedDict()
+_signal_lock = threading.Lock()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    ensure_db()
+    yield
+
+
+app = FastAPI(title="TradingScreen API", lifespan=lifespan)
+
+
+class OrderRequest(BaseModel):
+    market: str
+    symbol: str
+    side: str
+    quantity: float
+    price: float | None = None  # Limit price; without it, fill at the latest close
+    # Chart time the trade is booked at; required for limit orders, which
+    # only fill on bars after it
+    timestamp: str | None = None
+
+
+def _json(body, headers=None):
+    return Response(json.dumps(body), media_type="application/json", headers=headers)
+
+
+def _records(frame):
+    """DataFrame rows as JSON-safe dicts (NaN -> null, dates as ISO strings)"""
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+
+def _check_market(market, timeframe=None):
+    if market not in MARKETS:
+        raise HTTPException(404, f"Unknown market {market}")
+    if timeframe is not None and timeframe not in TIMEFRAMES:
+        raise HTTPException(400, f"Unknown timeframe {timeframe}")
+
+
+def _timestamp(value, name):
+    try:
+        return pd.Timestamp(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"Invalid {name} {value!r}")
+
+
+def _load(market, symbol, timeframe, start=None, end=None):
+    """Dataset handle from the shared store (fetched on a miss)"""
+    history_range = None
+    if start is not None or end is not None:
+        history_range = (
+            _timestamp(start or 0, "start"),
+            _timestamp(end or "2262-01-01", "end"),
+        )
+    dataset = load_dataset(
+        get_full_symbol(market, symbol),
+        EXCHANGE_MAPPINGS.get(market),
+        get_interval(timeframe),
+        timeframe,
+        history_range,
+    )
+    if dataset is None:
+        raise HTTPException(404, f"No data for {market}:{symbol} {timeframe}")
+    return dataset
+
+
+def _etag(dataset, *parts):
+    digest = hashlib.sha1(repr((dataset.key, dataset.version) + parts).encode())
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def _response_format(request, requested):
+    if requested:
+        return requested
+    accept = request.headers.get("accept", "")
+    if ARROW_TYPE in accept:
+        return "arrow"
+    if MSGPACK_TYPE in accept:
+        return "msgpack"
+    return "json"
+
+
+def _columns_response(request, etag, fmt, symbol, timestamps, columns):
+    """Serialize int64 ns timestamps plus named columns in the chosen format"""
+    headers = {"ETag": etag, "Cache-Control": f"max-age={API_CACHE_SECONDS}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    if fmt == "arrow":
+        if pa is None:
+            raise HTTPException(406, "pyarrow is not installed")
+        table = pa.table(
+            {"timestamp": timestamps.view("datetime64[ns]"), **columns},
+            metadata={"symbol": symbol},
+        )
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue(), media_type=ARROW_TYPE, headers=headers)
+
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise HTTPException(406, "msgpack is not installed")
+        payload = {
+            "symbol": symbol,
+            "columns": {
+                name: {"dtype": values.dtype.str, "data": values.tobytes()}
+                for name, values in {"timestamp": timestamps, **columns}.items()
+            },
+        }
+        return Response(
+            msgpack.packb(payload), media_type=MSGPACK_TYPE, headers=headers
+        )
+
+    if fmt != "json":
+        raise HTTPException(400, f"Unknown format {fmt}")
+    body = {"symbol": symbol, "timestamp": timestamps.tolist()}
+    for name, values in columns.items():
+        if values.dtype == np.float32:
+            # Shortest decimals, e.g. 12.3 rather than 12.300000190734863
+            values = values.astype(str).astype(np.float64)
+        # NaN is not valid JSON
+        body[name] = np.where(np.isnan(values), None, values).tolist()
+    return _json(body, headers)
+
+
+@app.get("/markets/{market}/symbols")
+async def symbols(market: str):
+    _check_market(market)
+    return await run_in_threadpool(fetch_market_symbols, market)
+
+
+@app.get("/bars/{market}/{symbol}")
+async def bars(
+    request: Request,
+    market: str,
+    symbol: str,
+    timeframe: str = "1h",
+    start: str | None = None,
+    end: str | None = None,
+    limit: int | None = None,
+    format: str | None = None,
+):
+    _check_market(market, timeframe)
+    dataset = await run_in_threadpool(_load, market, symbol, timeframe, start, end)
+    data = dataset.bars
+    if limit:
+        data = data.view(None, -limit)
+    fmt = _response_format(request, format)
+    return _columns_response(
+        request,
+        _etag(dataset, limit, fmt),
+        fmt,
+        data.symbol,
+        data.timestamps,
+        {column: getattr(data, column) for column in COLUMNS},
+    )
+
+
+@app.get("/series/{market}/{symbol}")
+async def series(
+    request: Request,
+    market: str,
+    symbol: str,
+    node: str,
+    timeframe: str = "1h",
+    limit: int | None = None,
+    format: str | None = None,
+):
+    """Indicator graph node, e.g. node=ema,close,20 or node=rsi,14"""
+    _check_market(market, timeframe)
+    kind, *raw_params = node.split(",")
+    if kind not in NODES:
+        raise HTTPException(400, f"Unknown node {kind}, one of {sorted(NODES)}")
+    node_id = (kind,) + tuple(int(p) if p.isdigit() else p for p in raw_params)
+
+    dataset = await run_in_threadpool(_load, market, symbol, timeframe)
+    data = dataset.bars
+    if limit:
+        data = data.view(None, -limit)
+    try:
+        values = await run_in_threadpool(node_values, data, node_id)
+    except (TypeError, KeyError, AttributeError) as e:
+        raise HTTPException(400, f"Invalid node {node}: {e}")
+    fmt = _response_format(request, format)
+    return _columns_response(
+        request,
+        _etag(dataset, node_id, limit, fmt),
+        fmt,
+        data.symbol,
+        data.timestamps,
+        {node: values},
+    )
+
+
+def _signals(dataset, indicator, symbol, timeframe):
+    key = (dataset.key, dataset.version, indicator)
+    with _signal_lock:
+        cached = _signal_cache.get(key)
+        if cached is not None:
+            _signal_cache.move_to_end(key)
+            return cached
+    from utils.signals import compute_indicator_signals
+
+    signals = compute_indicator_signals(indicator, dataset.bars, symbol, timeframe)
+    with _signal_lock:
+        _signal_cache[key] = signals
+        while len(_signal_cache) > API_SIGNAL_CACHE_SIZE:
+            _signal_cache.popitem(last=False)
+    return signals
+
+
+@app.get("/signals/{market}/{symbol}")
+async def signals(
+    request: Request, market: str, symbol: str, indicator: str, timeframe: str = "1h"
+):
+    from helpers.indicator_info import indicators
+
+    _check_market(market, timeframe)
+    if indicator not in indicators:
+        raise HTTPException(404, f"Unknown indicator {indicator}")
+    dataset = await run_in_threadpool(_load, market, symbol, timeframe)
+    etag = _etag(dataset, indicator)
+    headers = {"ETag": etag, "Cache-Control": f"max-age={API_CACHE_SECONDS}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    result = await run_in_threadpool(_signals, dataset, indicator, symbol, timeframe)
+    body = [
+        {
+            **signal,
+            "timestamp": signal["timestamp"].isoformat(),
+            "price": float(signal["price"]),
+        }
+        for signal in result
+    ]
+    return _json(body, headers)
+
+
+@app.get("/users/{username}/portfolio")
+async def portfolio(username: str):
+    user_id = await run_in_threadpool(login, username)
+    valuation = await run_in_threadpool(value_portfolio, user_id)
+    valuation["positions"] = _records(valuation["positions"])
+    valuation["exposure"] = _records(valuation["exposure"])
+    return _json(valuation)
+
+
+@app.get("/users/{username}/trades")
+async def trades(username: str, limit: int = 100):
+    user_id = await run_in_threadpool(login, username)
+    recent = await run_in_threadpool(get_recent_transactions, user_id, limit)
+    return _json(_records(recent))
+
+
+def _authorize(request):
+    if API_TOKEN and request.headers.get("authorization") != f"Bearer {API_TOKEN}":
+        raise HTTPException(401, "Missing or invalid API token")
+
+
+@app.post("/users/{username}/orders")
+async def place_order(request: Request, username: str, order: OrderRequest):
+    """Fill a market order at the latest known close, or, with `price`, rest a
+    limit order placed at chart time `timestamp` in the order book (filled as
+    the user's replay moves past it)
+    """
+    _authorize(request)
+    _check_market(order.market)
+    side = order.side.upper()
+    if side not in ("BUY", "SELL"):
+        raise HTTPException(400, "side must be BUY or SELL")
+    if order.quantity <= 0:
+        raise HTTPException(400, "quantity must be greater than 0")
+    if order.price is not None and not order.price > 0:
+        raise HTTPException(400, "price must be greater than 0")
+    if order.price is not None and not order.timestamp:
+        # Booked at now(), a limit order would never fill during a replay
+        raise HTTPException(400, "timestamp is required for limit orders")
+    timestamp = (
+        _timestamp(order.timestamp, "timestamp")
+        if order.timestamp
+        else pd.Timestamp.now()
+    )
+
+    user_id = await run_in_threadpool(login, username)
+
+    if order.price is not None:
+        order_id = await run_in_threadpool(
+            add_order,
+            user_id,
+            order.symbol,
+            order.market,
+            side,
+            "LIMIT",
+            order.quantity,
+            order.price,
+            timestamp,
+        )
+        return _json({"order_id": order_id, "status": "OPEN"})
+
+    price = await run_in_threadpool(lookup_price, order.symbol, order.market)
+    if price is None or np.isnan(price):
+        raise HTTPException(409, f"No price known for {order.symbol}")
+    try:
+        return await run_in_threadpool(
+            execute_trade,
+            side,
+            user_id,
+            order.symbol,
+            order.market,
+            order.quantity,
+            float(price),
+            timestamp,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
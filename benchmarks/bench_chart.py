@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("helpers.heikinashi")
+
+from utils.bars import Bars  # noqa: E402
+from utils.chart_utils import create_candlestick_chart, find_nearest_bars  # noqa: E402
+
+MOVING_AVERAGES = [
+    {"type": "SMA", "period": 20, "color": "#ff0000"},
+    {"type": "EMA", "period": 50, "color": "#00ff00"},
+]
+
+
+def _trades(data, count=50):
+    step = max(len(data) // count, 1)
+    return [
+        {
+            "type": "BUY" if i % 2 == 0 else "SELL",
+            "timestamp": data.index[i * step],
+            "price": data["close"].iloc[i * step],
+        }
+        for i in range(min(count, len(data)))
+    ]
+
+
+@pytest.mark.parametrize("chart_type", ["normal", "heikinashi"])
+def bench_create_candlestick_chart(benchmark, ohlcv, chart_type):
+    trades = _trades(ohlcv)
+    benchmark(
+        create_candlestick_chart,
+        ohlcv,
+        "TEST",
+        "1m",
+        cutoff_index=len(ohlcv),
+        trades=trades,
+        moving_averages=MOVING_AVERAGES,
+        chart_type=chart_type,
+    )
+
+
+def bench_chart_to_json(benchmark, ohlcv):
+    fig = create_candlestick_chart(
+        ohlcv,
+        "TEST",
+        "1m",
+        trades=_trades(ohlcv),
+        moving_averages=MOVING_AVERAGES,
+    )
+    benchmark(fig.to_json)
+
+
+def bench_find_nearest_bars(benchmark, ohlcv):
+    bars = Bars.from_frame(ohlcv)
+    target = ohlcv.index[len(ohlcv) // 2]
+    benchmark(find_nearest_bars, np.array([target]), bars)
@@ -0,0 +1,12 @@
+from utils.market_data import clean_market_data
+
+
+def bench_clean_market_data(benchmark, ohlcv):
+    raw = ohlcv.copy()
+    raw.index = raw.index.astype(str)
+
+    benchmark.pedantic(
+        clean_market_data,
+        setup=lambda: ((raw.copy(), "BIST"), {}),
+        rounds=5,
+    )
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.db_utils import add_transaction, get_chart_trades, update_asset
+from utils.user_store import adjust_balance
+
+START = datetime(2024, 1, 1, 10, 0)
+
+
+def _insert_transactions(count):
+    for i in range(count):
+        add_transaction(
+            1, "TEST", "BUY", 1.0, 100.0, 100.0, 0, "BIST", START + timedelta(minutes=i)
+        )
+
+
+def bench_add_transaction(benchmark, trading_db):
+    benchmark(
+        add_transaction, 1, "TEST", "BUY", 1.0, 100.0, 100.0, 0, "BIST", START
+    )
+
+
+def bench_update_asset(benchmark, trading_db):
+    benchmark(update_asset, 1, "TEST", 10.0, 100.0, 1000.0, "BIST")
+
+
+def bench_adjust_balance(benchmark, trading_db):
+    benchmark(adjust_balance, 1, -1)
+
+
+@pytest.mark.parametrize("history", [100, 10_000])
+def bench_get_chart_trades(benchmark, trading_db, history):
+    _insert_transactions(history)
+    benchmark(get_chart_trades, 1, "TEST", "BIST")
@@ -0,0 +1,61 @@
+import pytest
+
+from synthetic import make_ohlcv
+
+pytest.importorskip("helpers.heikinashi")
+
+from helpers.heikinashi import heikin_ashi  # noqa: E402
+from utils.bars import Bars  # noqa: E402
+from utils.chart_utils import calculate_ma  # noqa: E402
+from utils.indicator_graph import IndicatorGraph  # noqa: E402
+
+
+@pytest.mark.parametrize("ma_type", ["SMA", "EMA"])
+def bench_calculate_ma(benchmark, ohlcv, ma_type):
+    """Cold computation: a fresh graph per round"""
+    bars = Bars.from_frame(ohlcv)
+    benchmark(lambda: IndicatorGraph(bars).get((ma_type.lower(), "close", 50)))
+
+
+@pytest.mark.parametrize("ma_type", ["SMA", "EMA"])
+def bench_calculate_ma_cached(benchmark, ohlcv, ma_type):
+    """Repeat lookups on the same dataset, as every replay step does"""
+    bars = Bars.from_frame(ohlcv)
+    benchmark(calculate_ma, bars, 50, ma_type)
+
+
+def bench_indicator_graph_append(benchmark, ohlcv):
+    """One new bar on top of a graph with MACD, RSI and ATR computed"""
+    old = Bars.from_frame(ohlcv.iloc[:-1])
+    new = Bars.from_frame(ohlcv)
+    nodes = [("macd_signal", 12, 26, 9), ("rsi", 14), ("atr", 14)]
+    graph = IndicatorGraph(old)
+    for node_id in nodes:
+        graph.get(node_id)
+
+    def extend():
+        extended = IndicatorGraph(new, graph)
+        for node_id in nodes:
+            extended.get(node_id)
+
+    benchmark(extend)
+
+
+def bench_heikin_ashi(benchmark, ohlcv):
+    benchmark(heikin_ashi, ohlcv)
+
+
+def _indicator_names():
+    try:
+        from helpers.indicator_info import indicators
+    except ImportError:
+        return []
+    return sorted(indicators)
+
+
+@pytest.mark.parametrize("name", _indicator_names())
+def bench_indicator(benchmark, name):
+    from helpers.indicator_info import indicators
+
+    data = make_ohlcv(2500, freq="1h")
+    benchmark(indicators[name], data, "TEST", "1h")
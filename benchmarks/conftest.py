@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_ohlcv  # noqa: E402
+
+# BENCH_SIZES=2500,50000 limits the run to the given bar counts
+BAR_COUNTS = [
+    int(size) for size in os.environ.get("BENCH_SIZES", "2500,50000,1000000").split(",")
+]
+
+_frames = {}
+
+
+def _frame(n_bars):
+    if n_bars not in _frames:
+        _frames[n_bars] = make_ohlcv(n_bars)
+    return _frames[n_bars]
+
+
+@pytest.fixture(params=BAR_COUNTS, ids=lambda n: f"{n}bars")
+def ohlcv(request):
+    """Synthetic OHLCV frame; treat as read-only, it is shared across benchmarks"""
+    return _frame(request.param)
+
+
+@pytest.fixture
+def trading_db(tmp_path, monkeypatch):
+    """Fresh trading.db in a temporary working directory"""
+    from utils.db_utils import init_db, init_user
+
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    init_user(1, initial_balance=1e12)
+    return tmp_path / "trading.db"
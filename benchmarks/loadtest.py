@@ -0,0 +1,249 @@
+"""Simulate concurrent trading sessions against a stubbed market data provider.
+
+    python benchmarks/loadtest.py --sessions 16 --duration 30
+    python benchmarks/loadtest.py --sessions 8 --processes --provider-latency 200
+
+Each session logs in as its own trader and loops over the app's hot paths:
+loading datasets (through the shared dataset store, the scheduler,
+coalescing, cleaning and the archive, with TvDatafeed replaced by synthetic
+data), building the chart, placing and replaying orders, and trading.
+The upstream rate limits are lifted unless --upstream-limits is given, so
+the run measures the app rather than the configured request budget.
+Everything runs in a scratch working directory, so the real trading.db and
+archive are never touched.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_ohlcv  # noqa: E402
+
+TIMEFRAME = "1h"
+
+
+def _stub_provider(args):
+    """Replace the TvDatafeed download with deterministic synthetic bars"""
+    from utils import market_data
+    from utils.scheduler import RequestScheduler
+
+    latency = args.provider_latency / 1000
+
+    def get_hist(symbol, exchange, interval, n_bars):
+        time.sleep(latency)
+        seed = zlib.crc32(symbol.encode()) % args.symbols
+        return make_ohlcv(
+            n_bars, freq="1h", start="2024-01-01", seed=seed, symbol=symbol
+        )
+
+    market_data.tv.get_hist = get_hist
+    if not args.upstream_limits:
+        market_data.schedulers["tvdatafeed"] = RequestScheduler(
+            "tvdatafeed",
+            rate=1e6,
+            burst=1e6,
+            timeout=60,
+            max_concurrency=args.sessions,
+        )
+
+
+def run_session(session, args):
+    """One simulated user; returns ({operation: [latencies]}, {error: count})"""
+    from utils.chart_utils import create_candlestick_chart
+    from utils.db_utils import add_order, ensure_db, get_chart_trades
+    from utils.intervals import get_interval
+    from utils.market_data import load_dataset
+    from utils.orders import process_orders
+    from utils.trading import execute_buy, execute_sell
+    from utils.user_store import login
+
+    if args.processes:
+        _stub_provider(args)
+    ensure_db()
+    interval = get_interval(TIMEFRAME)
+    rng = random.Random(session)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    def timed_call(operation, func, *func_args):
+        start = time.perf_counter()
+        try:
+            return func(*func_args)
+        except sqlite3.OperationalError as e:
+            kind = "lock" if "locked" in str(e) else "sqlite"
+            errors[f"{operation}: {kind}"] += 1
+        except ValueError:
+            errors[f"{operation}: rejected"] += 1  # e.g. insufficient balance
+        except Exception as e:
+            errors[f"{operation}: {type(e).__name__}"] += 1
+        finally:
+            latencies[operation].append(time.perf_counter() - start)
+
+    user_id = timed_call("login", login, f"loadtest-{session}")
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        symbol = f"SYM{rng.randrange(args.symbols)}"
+        full_symbol = f"BINANCE:{symbol}"
+        dataset = timed_call(
+            "load", load_dataset, full_symbol, "BINANCE", interval, TIMEFRAME
+        )
+        if dataset is None:
+            continue
+        bars = dataset.bars
+        cutoff = rng.randrange(len(bars) // 2, len(bars) - args.steps)
+
+        trades = timed_call("chart_trades", get_chart_trades, user_id, symbol, "Crypto")
+        timed_call(
+            "chart",
+            create_candlestick_chart,
+            bars,
+            full_symbol,
+            TIMEFRAME,
+            cutoff,
+            trades,
+            None,
+            [{"type": "EMA", "period": 20, "color": "#ff0000"}],
+        )
+
+        price = bars.price(cutoff - 1)
+        placed_at = bars.timestamp(cutoff - 1)
+        timed_call("trade", execute_buy, user_id, symbol, "Crypto", 1, price, placed_at)
+        timed_call(
+            "order",
+            add_order,
+            user_id,
+            symbol,
+            "Crypto",
+            "SELL",
+            "LIMIT",
+            1,
+            round(price * 1.002, 2),
+            placed_at,
+        )
+        for step in range(args.steps):
+            timed_call(
+                "replay_step",
+                process_orders,
+                user_id,
+                symbol,
+                "Crypto",
+                bars,
+                cutoff + step,
+                cutoff + step + 1,
+            )
+        if rng.random() < 0.5:
+            timed_call(
+                "trade",
+                execute_sell,
+                user_id,
+                symbol,
+                "Crypto",
+                1,
+                bars.price(cutoff + args.steps - 1),
+                bars.timestamp(cutoff + args.steps - 1),
+            )
+    return dict(latencies), dict(errors)
+
+
+def report(results, elapsed):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for session_latencies, session_errors in results:
+        for operation, values in session_latencies.items():
+            latencies[operation].extend(values)
+        for error, count in session_errors.items():
+            errors[error] += count
+
+    rows = {}
+    for operation, values in sorted(latencies.items()):
+        values = np.array(values) * 1000
+        rows[operation] = {
+            "count": len(values),
+            "throughput_per_s": round(len(values) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "max_ms": round(float(values.max()), 2),
+        }
+    lock_errors = sum(count for error, count in errors.items() if "lock" in error)
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "operations": rows,
+        "errors": dict(errors),
+        "lock_errors": lock_errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument(
+        "--processes", action="store_true", help="one process per session"
+    )
+    parser.add_argument("--symbols", type=int, default=20, help="distinct symbols")
+    parser.add_argument("--steps", type=int, default=10, help="replay steps per loop")
+    parser.add_argument("--provider-latency", type=float, default=50, help="ms")
+    parser.add_argument(
+        "--upstream-limits",
+        action="store_true",
+        help="keep the production rate limits of the TvDatafeed scheduler",
+    )
+    parser.add_argument("--workdir", help="defaults to a fresh temporary directory")
+    parser.add_argument("--json", action="store_true", help="print the raw report")
+    args = parser.parse_args()
+
+    # trading.db and the archive are relative to the working directory
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="tradingscreen-load-"))
+    _stub_provider(args)
+    from utils.db_utils import ensure_db
+
+    ensure_db()
+
+    pool = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    start = time.perf_counter()
+    with pool(max_workers=args.sessions) as executor:
+        futures = [
+            executor.submit(run_session, session, args)
+            for session in range(args.sessions)
+        ]
+        results = [future.result() for future in futures]
+    summary = report(results, time.perf_counter() - start)
+    summary["sessions"] = args.sessions
+    summary["mode"] = "processes" if args.processes else "threads"
+    summary["workdir"] = os.getcwd()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(
+        f"{summary['sessions']} sessions ({summary['mode']}), "
+        f"{summary['elapsed_s']}s, workdir {summary['workdir']}"
+    )
+    print(
+        f"{'operation':<14}{'count':>8}{'ops/s':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for operation, row in summary["operations"].items():
+        print(
+            f"{operation:<14}{row['count']:>8}{row['throughput_per_s']:>10}"
+            f"{row['p50_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}"
+        )
+    print(f"lock errors: {summary['lock_errors']}")
+    for error, count in sorted(summary["errors"].items()):
+        print(f"  {error}: {count}")
+
+
+if __name__ == "__main__":
+    main()
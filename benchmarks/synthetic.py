@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+
+def make_ohlcv(n_bars, freq="1min", start="2020-01-01 10:00", seed=0, symbol="BIST:TEST"):
+    """Generate a random-walk OHLCV frame shaped like TvDatafeed output"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.001, n_bars)
+    close = 100 * np.exp(np.cumsum(returns))
+    open_ = np.empty(n_bars)
+    open_[0] = 100.0
+    open_[1:] = close[:-1]
+    spread = np.abs(rng.normal(0, 0.0005, n_bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.integers(1_000, 100_000, n_bars).astype(float)
+
+    index = pd.date_range(start=start, periods=n_bars, freq=freq, name="datetime")
+    return pd.DataFrame(
+        {
+            "symbol": symbol,
+            "open": open_.round(2),
+            "high": high.round(2),
+            "low": low.round(2),
+            "close": close.round(2),
+            "volume": volume,
+        },
+        index=index,
+    )
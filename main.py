@@ -1,24 +1,60 @@
 import streamlit as st
-from utils.market_data import fetch_market_symbols, fetch_market_data, get_full_symbol
+from utils.market_data import (
+    fetch_market_symbols,
+    get_full_symbol,
+    load_dataset,
+    schedulers,
+)
 from utils.intervals import get_interval
 from utils.chart_utils import create_candlestick_chart, display_statistics
-from utils.config import MARKETS, TIMEFRAMES, EXCHANGE_MAPPINGS
+from utils.archive import archive_span
+from utils.signals import compute_indicator_signals
+from utils.portfolio import value_portfolio
+from utils.user_store import login, get_balance, set_balance
+from utils.trading import execute_buy, execute_sell
+from utils.orders import ORDER_TYPES, process_orders
+from utils.scanner import scan_market
+from utils.eligibility import eligibility_index, pick_random_symbol
+from utils.dataset_store import acquire
+from utils.snapshots import load_snapshot, save_snapshot
+from utils.correlation import basket_analysis
+from utils.history_io import export_history
+from utils.config import MARKETS, TIMEFRAMES, EXCHANGE_MAPPINGS, METRICS_PORT
+import io
 import random
-import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 from utils.db_utils import (
-    init_db,
-    get_user_balance,
-    update_user_balance,
-    add_transaction,
-    update_asset,
-    init_user,
+    ensure_db,
+    get_asset,
+    add_order,
+    cancel_order,
+    get_open_orders,
+    get_chart_trades,
+    get_recent_transactions,
+    get_user_stats,
+    get_daily_pnl,
+    get_leaderboard,
 )
 from datetime import datetime
 from helpers.indicator_info import indicators
+from utils.profiling import (
+    timed,
+    submit_in_context,
+    start_rerun,
+    get_rerun_timings,
+    log_rerun_timings,
+    start_metrics_server,
+)
 
 st.set_page_config(page_title="Market Data Viewer", layout="wide")
 
+# Shared by all sessions for work that overlaps a fetch (DB reads, indicators)
+background = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fetch")
+
 
 def initialize_session_state():
     if "symbols" not in st.session_state:
@@ -33,7 +69,13 @@ def initialize_session_state():
     if "cutoff_index" not in st.session_state:
         st.session_state.cutoff_index = None
     if "user_id" not in st.session_state:
-        st.session_state.user_id = 1  # Demo user
+        # Kimlik URL'de tutulur, sayfa yenilense de aynı kullanıcı kalır
+        username = st.query_params.get("user")
+        if not username:
+            username = f"guest-{uuid.uuid4().hex[:8]}"
+            st.query_params["user"] = username
+        st.session_state.username = username
+        st.session_state.user_id = login(username)
     if "trades" not in st.session_state:
         st.session_state.trades = []
     if "show_buy_input" not in st.session_state:
@@ -64,6 +106,130 @@ def initialize_session_state():
         st.session_state.last_symbol = None
 
 
+def current_data():
+    """Bars of the shared dataset this session is viewing"""
+    return st.session_state.dataset.bars
+
+
+def set_dataset(dataset):
+    """View `dataset`, keeping the replay cutoff inside its bars"""
+    st.session_state.dataset = dataset
+    cutoff = st.session_state.cutoff_index
+    if cutoff is not None:
+        st.session_state.cutoff_index = min(max(cutoff, 1), len(dataset.bars))
+
+
+def save_current_snapshot(market, timeframe):
+    """Snapshot the replay this session is viewing; returns the snapshot id"""
+    snapshot_id = save_snapshot(
+        current_data(),
+        st.session_state.trades,
+        st.session_state.indicator_signals,
+        dataset_key=list(st.session_state.dataset.key),
+        market=market,
+        symbol=st.session_state.selected_symbol,
+        timeframe=timeframe,
+        cutoff_index=st.session_state.cutoff_index,
+        moving_averages=st.session_state.moving_averages,
+        chart_layout=st.session_state.chart_layout,
+        chart_type=st.session_state.chart_type,
+        active_indicator=st.session_state.active_indicator,
+    )
+    st.session_state.restored_snapshot = snapshot_id
+    return snapshot_id
+
+
+def snapshot_link(snapshot_id):
+    """Link that opens a snapshot, without this session's ?user= identity"""
+    base = (st.context.url or "").split("?")[0]
+    return f"{base}?snapshot={snapshot_id}"
+
+
+def restore_snapshot(snapshot_id):
+    """Load a snapshot into the session, including the sidebar widgets"""
+    bars, trades, signals, meta = load_snapshot(snapshot_id)
+    key = tuple(meta["dataset_key"]) + ("snapshot", snapshot_id)
+    st.session_state.dataset = acquire(key, lambda: bars)
+    st.session_state.cutoff_index = meta["cutoff_index"]
+    st.session_state.trades = trades
+    st.session_state.indicator_signals = signals
+    st.session_state.chart_layout = meta["chart_layout"]
+
+    market = meta["market"]
+    if market != st.session_state.selected_market:
+        st.session_state.symbols = fetch_market_symbols(market)
+        st.session_state.selected_market = market
+    st.session_state.market = market
+    st.session_state.timeframe = meta["timeframe"]
+    st.session_state.selected_symbol = meta["symbol"]
+    if meta["symbol"] in st.session_state.symbols:
+        st.session_state.symbol = meta["symbol"]
+
+    st.session_state.chart_type = meta["chart_type"]
+    st.session_state.chart_type_radio = (
+        "Heikin-Ashi" if meta["chart_type"] == "heikinashi" else "Normal"
+    )
+    st.session_state.active_indicator = meta["active_indicator"]
+    st.session_state.indicator = meta["active_indicator"] or "None"
+
+    st.session_state.moving_averages = meta["moving_averages"]
+    st.session_state.ma_counter = len(meta["moving_averages"])
+    for i, ma in enumerate(meta["moving_averages"]):
+        st.session_state[f"ma_type_{i}"] = ma["type"]
+        st.session_state[f"ma_period_{i}"] = ma["period"]
+        st.session_state[f"ma_color_{i}"] = ma["color"]
+    st.session_state.restored_snapshot = snapshot_id
+
+
+def advance_replay(symbol, market, steps):
+    """Move the cutoff `steps` bars forward, settling everything crossed.
+
+    Orders and indicator signals in the skipped window are evaluated in one
+    sweep; only the final state is rendered. Returns False at the end of data.
+    """
+    data = current_data()
+    previous_cutoff = st.session_state.cutoff_index
+    cutoff = min(previous_cutoff + steps, len(data))
+    if cutoff <= previous_cutoff:
+        return False
+    st.session_state.cutoff_index = cutoff
+
+    trades, rejections = process_orders(
+        st.session_state.user_id, symbol, market, data, previous_cutoff, cutoff
+    )
+    st.session_state.trades.extend(trades)
+    for trade in trades:
+        st.toast(f"{trade['type']} order filled at {trade['price']:.4f}")
+    for message in rejections:
+        st.warning(message)
+
+    crossed = signals_between(
+        st.session_state.indicator_signals,
+        data.timestamp(previous_cutoff - 1) if previous_cutoff else None,
+        data.timestamp(cutoff - 1),
+    )
+    if crossed and cutoff - previous_cutoff > 1:
+        st.info(
+            f"{len(crossed)} indicator signal(s) in the skipped bars: "
+            + ", ".join(
+                f"{signal['type']} {signal['timestamp']:%d.%m.%Y %H:%M}"
+                for signal in crossed[-5:]
+            )
+        )
+    return True
+
+
+def signals_between(signals, start, end):
+    """Signals with start < timestamp <= end (start None means unbounded)"""
+    if not signals:
+        return []
+    times = np.array([signal["timestamp"].value for signal in signals])
+    mask = times <= end.value
+    if start is not None:
+        mask &= times > start.value
+    return [signal for signal, hit in zip(signals, mask) if hit]
+
+
 def update_symbols(market):
     if market != st.session_state.selected_market:
         st.session_state.symbols = fetch_market_symbols(market)
@@ -82,7 +248,7 @@ def update_chart(
             filtered_signals = st.session_state.indicator_signals
 
             if cutoff_index is not None:
-                current_timestamp = data.index[cutoff_index - 1]
+                current_timestamp = data.timestamp(cutoff_index - 1)
                 filtered_trades = [
                     trade
                     for trade in st.session_state.trades
@@ -117,20 +283,92 @@ def update_chart(
                 st.session_state.chart_layout = layout
                 st.session_state.chart_config = config
 
-            st.plotly_chart(
-                fig,
-                use_container_width=True,
-                key=key if key else "default_chart",
-                on_change=handle_layout_change,
-            )
+            with timed("st.plotly_chart"):
+                st.plotly_chart(
+                    fig,
+                    use_container_width=True,
+                    key=key if key else "default_chart",
+                    on_change=handle_layout_change,
+                )
+
+
+def render_history_io(user_id):
+    """Parquet export of the user's trades and positions"""
+    if st.button("Prepare export", key="prepare_history_export"):
+        trades, positions = io.BytesIO(), io.BytesIO()
+        counts = export_history(user_id, trades, positions)
+        st.session_state.history_export = (
+            trades.getvalue(),
+            positions.getvalue(),
+            counts,
+        )
+
+    if st.session_state.get("history_export"):
+        trades, positions, (trade_count, position_count) = (
+            st.session_state.history_export
+        )
+        dcol1, dcol2 = st.columns(2)
+        dcol1.download_button(
+            f"trades.parquet ({trade_count:,} rows)",
+            trades,
+            file_name="trades.parquet",
+            mime="application/vnd.apache.parquet",
+        )
+        dcol2.download_button(
+            f"positions.parquet ({position_count:,} rows)",
+            positions,
+            file_name="positions.parquet",
+            mime="application/vnd.apache.parquet",
+        )
+
+
+def display_timings():
+    """Show the spans recorded during the current rerun"""
+    timings = get_rerun_timings()
+    if not timings:
+        st.sidebar.info("No spans recorded yet")
+        return
+    timings_df = pd.DataFrame(
+        [
+            {
+                "span": name,
+                "calls": stats["count"],
+                "total (ms)": round(stats["total"] * 1000, 1),
+                "max (ms)": round(stats["max"] * 1000, 1),
+            }
+            for name, stats in timings.items()
+        ]
+    ).sort_values("total (ms)", ascending=False)
+    st.sidebar.dataframe(timings_df, hide_index=True)
+
+    upstream_df = pd.DataFrame(
+        [
+            {"upstream": name, **scheduler.snapshot()}
+            for name, scheduler in schedulers.items()
+        ]
+    )
+    st.sidebar.dataframe(upstream_df, hide_index=True)
 
 
 def main():
+    start_rerun()
     st.title("Market Data Viewer")
     st.sidebar.header("Settings")
 
     initialize_session_state()
 
+    # Paylaşılan snapshot linki veya Restore butonu; widget'lar çizilmeden önce
+    snapshot_id = st.session_state.pop("pending_snapshot", None)
+    shared_id = st.query_params.get("snapshot")
+    if snapshot_id is None and shared_id != st.session_state.get("restored_snapshot"):
+        snapshot_id = shared_id
+    if snapshot_id:
+        try:
+            restore_snapshot(snapshot_id)
+        except (FileNotFoundError, ValueError) as e:
+            st.error(f"Could not restore snapshot {snapshot_id}: {e}")
+            st.session_state.restored_snapshot = snapshot_id
+
     # Add containers
     chart_container = st.empty()
     trading_container = st.container()
@@ -145,7 +383,7 @@ def main():
     )
     st.session_state.chart_type = chart_type.lower().replace("-", "")
 
-    timeframe = st.sidebar.selectbox("Select Timeframe", TIMEFRAMES)
+    timeframe = st.sidebar.selectbox("Select Timeframe", TIMEFRAMES, key="timeframe")
 
     # Yeni "Random Symbol" butonu
     if st.sidebar.button("Random Symbol"):
@@ -153,49 +391,47 @@ def main():
             # Mevcut sembolü kaydet
             st.session_state.last_symbol = st.session_state.selected_symbol
             
-            # Şu anki sembol dışındaki sembollerden rastgele seç
-            available_symbols = [s for s in st.session_state.symbols if s != st.session_state.selected_symbol]
-            if available_symbols:
-                random_symbol = random.choice(available_symbols)
-                st.session_state.selected_symbol = random_symbol
+            # Önce geçmişi yeterli sembollerden seç, havuz boşsa tüm listeden dene
+            index = eligibility_index(market, timeframe, st.session_state.symbols)
+            exchange = EXCHANGE_MAPPINGS.get(market)
+            interval = get_interval(timeframe)
+            
+            def load_random(symbol):
+                full_symbol = get_full_symbol(market, symbol)
+                return load_dataset(full_symbol, exchange, interval, timeframe)
+            
+            try:
+                with st.spinner("Fetching data for new symbol..."):
+                    random_symbol, dataset = pick_random_symbol(
+                        index,
+                        st.session_state.symbols,
+                        load_random,
+                        exclude=st.session_state.selected_symbol,
+                    )
                 
-                # Yeni sembol için veri çek
-                try:
-                    with st.spinner("Fetching data for new symbol..."):
-                        exchange = EXCHANGE_MAPPINGS.get(market)
-                        interval = get_interval(timeframe)
-                        full_symbol = get_full_symbol(market, random_symbol)
-                        
-                        data = fetch_market_data(full_symbol, exchange, interval)
-                        
-                        if data is not None and not data.empty:
-                            st.session_state.current_data = data
-                            
-                            # Rastgele bir nokta seç
-                            min_idx = int(len(data) * 0.2)
-                            max_idx = int(len(data) * 0.8)
-                            st.session_state.cutoff_index = random.randint(min_idx, max_idx)
-                            
-                            # Aktif indikatör varsa sinyalleri hesapla
-                            if st.session_state.active_indicator and st.session_state.active_indicator != "None":
-                                indicator_func = indicators[st.session_state.active_indicator]
-                                signals_df = indicator_func(data, random_symbol, timeframe)
-                                
-                                st.session_state.indicator_signals = [
-                                    {
-                                        "timestamp": pd.to_datetime(row["Sinyal Tarihi"], format="%d.%m.%Y %H:%M"),
-                                        "price": row["Son Fiyat"],
-                                        "type": row["Sinyal Türü"],
-                                        "indicator": st.session_state.active_indicator,
-                                    }
-                                    for _, row in signals_df.iterrows()
-                                ]
-                            
-                            st.rerun()
-                except Exception as e:
-                    st.error(f"Error fetching data: {str(e)}")
-                    # Hata durumunda önceki sembole geri dön
-                    st.session_state.selected_symbol = st.session_state.last_symbol
+                if dataset is not None:
+                    st.session_state.selected_symbol = random_symbol
+                    set_dataset(dataset)
+                    data = dataset.bars
+                    
+                    # Rastgele bir nokta seç
+                    min_idx = int(len(data) * 0.2)
+                    max_idx = int(len(data) * 0.8)
+                    st.session_state.cutoff_index = random.randint(min_idx, max_idx)
+                    
+                    # Aktif indikatör varsa sinyalleri hesapla
+                    if st.session_state.active_indicator and st.session_state.active_indicator != "None":
+                        st.session_state.indicator_signals = compute_indicator_signals(
+                            st.session_state.active_indicator, data, random_symbol, timeframe
+                        )
+                    
+                    st.rerun()
+                else:
+                    st.error("No symbol with enough history found, try again")
+            except Exception as e:
+                st.error(f"Error fetching data: {str(e)}")
+                # Hata durumunda önceki sembole geri dön
+                st.session_state.selected_symbol = st.session_state.last_symbol
 
     # Sayfa ilk yüklendiğinde veya market değiştiğinde sembolleri yükle
     if not st.session_state.symbols or market != st.session_state.selected_market:
@@ -205,6 +441,14 @@ def main():
             if st.session_state.symbols:
                 st.session_state.selected_symbol = st.session_state.symbols[0]
 
+    # Random Symbol havuzu arka planda hazırlanır
+    if st.session_state.symbols:
+        pool = eligibility_index(market, timeframe, st.session_state.symbols)
+        st.sidebar.caption(
+            f"Random pool: {len(pool)} eligible symbols"
+            + (f" (checked {pool.checked}/{pool.total})" if pool.building else "")
+        )
+
     # Symbol selection
     if st.session_state.symbols:
         selected_symbol = st.sidebar.selectbox(
@@ -228,25 +472,10 @@ def main():
 
     if indicator_name != "None" and indicator_name != st.session_state.active_indicator:
         st.session_state.active_indicator = indicator_name
-        if "current_data" in st.session_state:
-            # Calculate indicator signals
-            indicator_func = indicators[indicator_name]
-            signals_df = indicator_func(
-                st.session_state.current_data, selected_symbol, timeframe
+        if "dataset" in st.session_state:
+            st.session_state.indicator_signals = compute_indicator_signals(
+                indicator_name, current_data(), selected_symbol, timeframe
             )
-
-            # Convert signals to the format we need
-            st.session_state.indicator_signals = [
-                {
-                    "timestamp": pd.to_datetime(
-                        row["Sinyal Tarihi"], format="%d.%m.%Y %H:%M"
-                    ),
-                    "price": row["Son Fiyat"],
-                    "type": row["Sinyal Türü"],
-                    "indicator": indicator_name,
-                }
-                for _, row in signals_df.iterrows()
-            ]
     elif indicator_name == "None":
         st.session_state.active_indicator = None
         st.session_state.indicator_signals = []
@@ -297,8 +526,20 @@ def main():
         st.session_state.ma_counter -= 1
         st.rerun()
 
+    # Trader identity
+    st.sidebar.caption(f"Trader: {st.session_state.username}")
+    with st.sidebar.expander("Switch Trader"):
+        with st.form("switch_trader_form"):
+            new_username = st.text_input("Username", value=st.session_state.username)
+            if st.form_submit_button("Switch") and new_username.strip():
+                st.session_state.username = new_username.strip()
+                st.session_state.user_id = login(st.session_state.username)
+                st.query_params["user"] = st.session_state.username
+                st.session_state.trades = []
+                st.rerun()
+
     # Display current balance and add balance update form
-    current_balance = get_user_balance(st.session_state.user_id)
+    current_balance = get_balance(st.session_state.user_id)
     st.sidebar.write(f"Current Balance: ${current_balance:.2f}")
     
     with st.sidebar.expander("Update Balance"):
@@ -309,79 +550,119 @@ def main():
             submit_balance = st.form_submit_button("Update Balance")
             
             if submit_balance:
-                update_user_balance(st.session_state.user_id, new_balance)
+                set_balance(st.session_state.user_id, new_balance)
                 st.success(f"Balance updated to ${new_balance:.2f}")
                 st.rerun()
 
+    # Archived history beyond the latest fetch
+    history_range = None
+    history_mode = st.sidebar.radio(
+        "History", ["Latest Bars", "Archive"], key="history_mode", horizontal=True
+    )
+    if history_mode == "Archive" and st.session_state.selected_symbol:
+        full_symbol = get_full_symbol(market, st.session_state.selected_symbol)
+        span = archive_span(full_symbol, timeframe)
+        if span:
+            first, last, length = pd.Timestamp(span[0]), pd.Timestamp(span[1]), span[2]
+            st.sidebar.caption(
+                f"{length:,} archived bars, {first:%d.%m.%Y} - {last:%d.%m.%Y}"
+            )
+            date_range = st.sidebar.date_input(
+                "Archive Range",
+                value=(first.date(), last.date()),
+                min_value=first.date(),
+                max_value=last.date(),
+            )
+            if len(date_range) == 2:
+                history_range = (
+                    pd.Timestamp(date_range[0]),
+                    pd.Timestamp(date_range[1]) + pd.Timedelta(days=1) - pd.Timedelta(1),
+                )
+        else:
+            st.sidebar.caption("No archived history yet; fetch data to start one")
+
     if st.sidebar.button("Fetch Data"):
         try:
+            # Önceki işlemler veri indirilirken arka planda yüklenir
+            trades_future = submit_in_context(
+                background,
+                get_chart_trades,
+                st.session_state.user_id,
+                selected_symbol,
+                market,
+            )
             with st.spinner("Fetching data..."):
                 exchange = EXCHANGE_MAPPINGS.get(market)
                 interval = get_interval(timeframe)
                 full_symbol = get_full_symbol(market, selected_symbol)
 
-                data = fetch_market_data(full_symbol, exchange, interval)
-
-                if data is not None and not data.empty:
-                    st.session_state.current_data = data
-
-                    # Önceki işlemleri yükle
-                    conn = sqlite3.connect("trading.db")
-                    transactions_df = pd.read_sql_query(
-                        """
-                        SELECT type, chart_timestamp, price
-                        FROM transactions 
-                        WHERE user_id = ? AND symbol = ? AND market = ?
-                        ORDER BY chart_timestamp
-                        """,
-                        conn,
-                        params=(st.session_state.user_id, selected_symbol, market),
+                dataset = load_dataset(
+                    full_symbol, exchange, interval, timeframe, history_range
+                )
+
+            if dataset is not None:
+                set_dataset(dataset)
+                data = dataset.bars
+                st.session_state.chart_key = "main_chart"
+                if history_range is None:
+                    # Yeni yüklenen sembol Random havuzuna girebilir
+                    eligibility_index(
+                        market, timeframe, st.session_state.symbols
+                    ).check(selected_symbol)
+
+                signals_future = None
+                if (
+                    st.session_state.active_indicator
+                    and st.session_state.active_indicator != "None"
+                ):
+                    signals_future = submit_in_context(
+                        background,
+                        compute_indicator_signals,
+                        st.session_state.active_indicator,
+                        data,
+                        selected_symbol,
+                        timeframe,
                     )
-                    conn.close()
-
-                    # trades listesini güncelle
-                    st.session_state.trades = [
-                        {
-                            "type": row["type"],
-                            "timestamp": pd.to_datetime(row["chart_timestamp"]),
-                            "price": row["price"],
-                        }
-                        for _, row in transactions_df.iterrows()
-                    ]
 
-                    # Aktif indikatör varsa sinyalleri hesapla
-                    if (
-                        st.session_state.active_indicator
-                        and st.session_state.active_indicator != "None"
-                    ):
-                        indicator_func = indicators[st.session_state.active_indicator]
-                        signals_df = indicator_func(data, selected_symbol, timeframe)
-
-                        # İndikatör sinyallerini güncelle
-                        st.session_state.indicator_signals = [
-                            {
-                                "timestamp": pd.to_datetime(
-                                    row["Sinyal Tarihi"], format="%d.%m.%Y %H:%M"
-                                ),
-                                "price": row["Son Fiyat"],
-                                "type": row["Sinyal Türü"],
-                                "indicator": st.session_state.active_indicator,
-                            }
-                            for _, row in signals_df.iterrows()
-                        ]
-
-                    st.session_state.chart_key = "main_chart"
-                    display_statistics(data)
-                else:
-                    st.error("No data available for the selected symbol")
+                # Mumları hemen çiz, işlemler ve sinyaller hazır olunca eklenir
+                st.session_state.trades = []
+                st.session_state.indicator_signals = []
+                update_chart(
+                    data,
+                    selected_symbol,
+                    timeframe,
+                    st.session_state.cutoff_index,
+                    container=chart_container,
+                    key="main_chart_loading",
+                )
+                display_statistics(data)
+
+                with st.spinner("Loading trades and signals..."):
+                    st.session_state.trades = trades_future.result()
+                    if signals_future is not None:
+                        st.session_state.indicator_signals = signals_future.result()
+            else:
+                st.error("No data available for the selected symbol")
         except Exception as e:
             st.error(f"Error fetching data: {str(e)}")
 
+    with st.sidebar.expander("Snapshots"):
+        if "dataset" in st.session_state and st.button("Save Snapshot"):
+            snapshot_id = save_current_snapshot(market, timeframe)
+            st.success(f"Saved snapshot {snapshot_id}")
+            # Sayfanın linki ?user= kimliğini taşır, paylaşılan link taşımamalı
+            st.caption("Share this link to open the same replay")
+            st.code(snapshot_link(snapshot_id), language=None)
+        restore_id = st.text_input("Snapshot ID")
+        if st.button("Restore Snapshot") and restore_id.strip():
+            st.session_state.pending_snapshot = restore_id.strip()
+            st.rerun()
+
     # Display chart if data exists
-    if "current_data" in st.session_state:
+    if "dataset" in st.session_state:
         show_portfolio = st.checkbox("Show Portfolio")
         update_chart(
-            st.session_state.current_data,
+            current_data(),
             selected_symbol,
             timeframe,
             st.session_state.cutoff_index,
@@ -390,7 +671,7 @@ def main():
         )
 
     # Trading functionality
-    if "current_data" in st.session_state:
+    if "dataset" in st.session_state:
         with trading_container:
             col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -403,20 +684,46 @@ def main():
                 buy_button = cols[3].form_submit_button("BUY")
                 sell_button = cols[4].form_submit_button("SELL")
 
-                if random_point or plus_one or plus_five or buy_button or sell_button:
+                # Fast-forward: N bars or up to a timestamp in one step
+                ff_cols = st.columns([1, 1, 1, 1, 1])
+                play_bars = ff_cols[0].number_input(
+                    "Bars", min_value=1, value=60, step=10, label_visibility="collapsed"
+                )
+                play = ff_cols[1].form_submit_button("Play Bars")
+                jump_date = ff_cols[2].date_input(
+                    "Jump Date",
+                    value=current_data().timestamp(-1).date(),
+                    label_visibility="collapsed",
+                )
+                jump_time = ff_cols[3].time_input(
+                    "Jump Time",
+                    value=current_data().timestamp(-1).time(),
+                    label_visibility="collapsed",
+                )
+                jump = ff_cols[4].form_submit_button("Jump To")
+
+                if (
+                    random_point
+                    or plus_one
+                    or plus_five
+                    or play
+                    or jump
+                    or buy_button
+                    or sell_button
+                ):
                     # Save current chart layout before action
                     if st.session_state.chart_layout is None:
                         st.session_state.chart_layout = {}
 
                 if random_point:
-                    data = st.session_state.current_data
+                    data = current_data()
                     min_idx = int(len(data) * 0.2)
                     max_idx = int(len(data) * 0.8)
                     st.session_state.cutoff_index = random.randint(min_idx, max_idx)
-                    display_statistics(data.iloc[: st.session_state.cutoff_index])
+                    display_statistics(data.view(st.session_state.cutoff_index))
 
                     # Grafik güncellenmeden önce trades listesini filtrele
-                    current_timestamp = data.index[st.session_state.cutoff_index - 1]
+                    current_timestamp = data.timestamp(st.session_state.cutoff_index - 1)
                     filtered_trades = [
                         trade
                         for trade in st.session_state.trades
@@ -426,30 +733,29 @@ def main():
                     st.session_state.trade_action = "random"
                     st.session_state.last_update = datetime.now()
 
-                if plus_one and st.session_state.cutoff_index is not None:
-                    st.session_state.cutoff_index += 1
-                    if st.session_state.cutoff_index <= len(
-                        st.session_state.current_data
-                    ):
-                        display_statistics(
-                            st.session_state.current_data.iloc[
-                                : st.session_state.cutoff_index
-                            ]
+                if st.session_state.cutoff_index is not None:
+                    steps = 0
+                    if plus_one:
+                        steps, action = 1, "plus_one"
+                    elif plus_five:
+                        steps, action = 5, "plus_five"
+                    elif play:
+                        steps, action = int(play_bars), "play"
+                    elif jump:
+                        target = pd.Timestamp.combine(jump_date, jump_time)
+                        steps = (
+                            current_data().position_after(target)
+                            - st.session_state.cutoff_index
                         )
-                        st.session_state.trade_action = "plus_one"
-                        st.session_state.last_update = datetime.now()
+                        action = "jump"
+                        if steps <= 0:
+                            st.warning("Jump target is not after the current bar")
 
-                if plus_five and st.session_state.cutoff_index is not None:
-                    st.session_state.cutoff_index += 5
-                    if st.session_state.cutoff_index <= len(
-                        st.session_state.current_data
-                    ):
+                    if steps > 0 and advance_replay(selected_symbol, market, steps):
                         display_statistics(
-                            st.session_state.current_data.iloc[
-                                : st.session_state.cutoff_index
-                            ]
+                            current_data().view(st.session_state.cutoff_index)
                         )
-                        st.session_state.trade_action = "plus_five"
+                        st.session_state.trade_action = action
                         st.session_state.last_update = datetime.now()
 
             # Buy form
@@ -458,9 +764,9 @@ def main():
                 st.session_state.show_sell_input = False
 
                 with st.form(key="buy_form"):
-                    current_price = st.session_state.current_data["close"].iloc[
+                    current_price = current_data().price(
                         st.session_state.cutoff_index - 1
-                    ]
+                    )
                     max_possible_quantity = current_balance / current_price
 
                     col1, col2 = st.columns([3, 1])
@@ -480,100 +786,40 @@ def main():
                         if use_max:
                             quantity = max_possible_quantity
 
-                        if quantity <= 0:
-                            st.error("Please enter a quantity greater than 0!")
-                        else:
-                            total_cost = quantity * current_price
-                            if total_cost <= current_balance:
-                                # Check if asset already exists
-                                conn = sqlite3.connect("trading.db")
-                                c = conn.cursor()
-                                c.execute(
-                                    """SELECT quantity, avg_price, total_cost FROM assets 
-                                       WHERE user_id = ? AND symbol = ? AND market = ?""",
-                                    (st.session_state.user_id, selected_symbol, market),
-                                )
-                                existing_asset = c.fetchone()
-                                conn.close()
-
-                                if existing_asset:
-                                    # Calculate new values for existing asset
-                                    new_quantity = existing_asset[0] + quantity
-                                    new_total_cost = existing_asset[2] + total_cost
-                                    new_avg_price = new_total_cost / new_quantity
-                                else:
-                                    # New asset values
-                                    new_quantity = quantity
-                                    new_avg_price = current_price
-                                    new_total_cost = total_cost
-
-                                update_user_balance(
-                                    st.session_state.user_id,
-                                    current_balance - total_cost,
-                                )
-
-                                chart_timestamp = st.session_state.current_data.index[
+                        try:
+                            trade = execute_buy(
+                                st.session_state.user_id,
+                                selected_symbol,
+                                market,
+                                quantity,
+                                current_price,
+                                current_data().timestamp(
                                     st.session_state.cutoff_index - 1
-                                ]
-                                add_transaction(
-                                    st.session_state.user_id,
-                                    selected_symbol,
-                                    "BUY",
-                                    quantity,
-                                    current_price,
-                                    total_cost,
-                                    0,
-                                    market,
-                                    chart_timestamp,
-                                )
-
-                                update_asset(
-                                    st.session_state.user_id,
-                                    selected_symbol,
-                                    new_quantity,
-                                    new_avg_price,
-                                    new_total_cost,
-                                    market,
-                                )
-
-                                st.session_state.trades.append(
-                                    {
-                                        "type": "BUY",
-                                        "timestamp": st.session_state.current_data.index[
-                                            st.session_state.cutoff_index - 1
-                                        ],
-                                        "price": current_price,
-                                    }
-                                )
-
-                                update_chart(
-                                    st.session_state.current_data,
-                                    selected_symbol,
-                                    timeframe,
-                                    st.session_state.cutoff_index,
-                                    chart_container,
-                                    key=f"buy_chart_{st.session_state.cutoff_index}_{random.randint(0, 1000)}",
-                                )
-                                st.session_state.trade_action = "buy"
-                                st.session_state.show_buy_input = False
-                                st.session_state.last_update = datetime.now()
-                            else:
-                                st.error("Insufficient balance!")
+                                ),
+                            )
+                        except ValueError as e:
+                            st.error(str(e))
+                        else:
+                            st.session_state.trades.append(trade)
+
+                            update_chart(
+                                current_data(),
+                                selected_symbol,
+                                timeframe,
+                                st.session_state.cutoff_index,
+                                chart_container,
+                                key=f"buy_chart_{st.session_state.cutoff_index}_{random.randint(0, 1000)}",
+                            )
+                            st.session_state.trade_action = "buy"
+                            st.session_state.show_buy_input = False
+                            st.session_state.last_update = datetime.now()
 
             # Sell form
             if sell_button or st.session_state.show_sell_input:
                 st.session_state.show_sell_input = True
                 st.session_state.show_buy_input = False
 
-                conn = sqlite3.connect("trading.db")
-                c = conn.cursor()
-                c.execute(
-                    """SELECT quantity, avg_price FROM assets 
-                           WHERE user_id = ? AND symbol = ? AND market = ?""",
-                    (st.session_state.user_id, selected_symbol, market),
-                )
-                position = c.fetchone()
-                conn.close()
+                position = get_asset(st.session_state.user_id, selected_symbol, market)
 
                 if position and position[0] > 0:
                     with st.form(key="sell_form"):
@@ -595,56 +841,26 @@ def main():
                             if use_max:
                                 quantity = position[0]
 
-                            if quantity <= 0:
-                                st.error("Please enter a quantity greater than 0!")
-                            else:
-                                current_price = st.session_state.current_data[
-                                    "close"
-                                ].iloc[st.session_state.cutoff_index - 1]
-                                total_amount = quantity * current_price
-                                profit_loss = (current_price - position[1]) * quantity
-
-                                update_user_balance(
-                                    st.session_state.user_id,
-                                    current_balance + total_amount,
-                                )
-
-                                chart_timestamp = st.session_state.current_data.index[
-                                    st.session_state.cutoff_index - 1
-                                ]
-                                add_transaction(
+                            try:
+                                trade = execute_sell(
                                     st.session_state.user_id,
                                     selected_symbol,
-                                    "SELL",
-                                    quantity,
-                                    current_price,
-                                    total_amount,
-                                    profit_loss,
                                     market,
-                                    chart_timestamp,
-                                )
-
-                                update_asset(
-                                    st.session_state.user_id,
-                                    selected_symbol,
-                                    position[0] - quantity,
-                                    position[1],
-                                    position[1] * (position[0] - quantity),
-                                    market,
-                                )
-
-                                st.session_state.trades.append(
-                                    {
-                                        "type": "SELL",
-                                        "timestamp": st.session_state.current_data.index[
-                                            st.session_state.cutoff_index - 1
-                                        ],
-                                        "price": current_price,
-                                    }
+                                    quantity,
+                                    current_data().price(
+                                        st.session_state.cutoff_index - 1
+                                    ),
+                                    current_data().timestamp(
+                                        st.session_state.cutoff_index - 1
+                                    ),
                                 )
+                            except ValueError as e:
+                                st.error(str(e))
+                            else:
+                                st.session_state.trades.append(trade)
 
                                 update_chart(
-                                    st.session_state.current_data,
+                                    current_data(),
                                     selected_symbol,
                                     timeframe,
                                     st.session_state.cutoff_index,
@@ -658,11 +874,61 @@ def main():
                     st.error("No position to sell!")
                     st.session_state.show_sell_input = False
 
+            # Working orders (limit / stop)
+            with st.expander("Working Orders"):
+                with st.form(key="order_form"):
+                    ocol1, ocol2, ocol3 = st.columns(3)
+                    order_label = ocol1.selectbox("Order Type", list(ORDER_TYPES))
+                    order_quantity = ocol2.number_input("Quantity", min_value=0.0)
+                    order_price = ocol3.number_input(
+                        "Price",
+                        min_value=0.0,
+                        value=current_data().price(
+                            (st.session_state.cutoff_index or len(current_data())) - 1
+                        ),
+                        format="%.4f",
+                    )
+                    if st.form_submit_button("Place Order"):
+                        if order_quantity <= 0 or order_price <= 0:
+                            st.error("Please enter a quantity and price greater than 0!")
+                        elif st.session_state.cutoff_index is None:
+                            st.error("Start a replay before placing orders!")
+                        else:
+                            side, order_type = ORDER_TYPES[order_label]
+                            add_order(
+                                st.session_state.user_id,
+                                selected_symbol,
+                                market,
+                                side,
+                                order_type,
+                                order_quantity,
+                                order_price,
+                                current_data().timestamp(
+                                    st.session_state.cutoff_index - 1
+                                ),
+                            )
+                            st.success(f"{order_label} order placed")
+
+                open_orders = get_open_orders(
+                    st.session_state.user_id, selected_symbol, market
+                )
+                if not open_orders.empty:
+                    st.dataframe(open_orders, hide_index=True)
+                    ocol1, ocol2 = st.columns([3, 1])
+                    order_to_cancel = ocol1.selectbox(
+                        "Order", open_orders["id"], key="order_to_cancel"
+                    )
+                    if ocol2.button("Cancel Order"):
+                        cancel_order(st.session_state.user_id, int(order_to_cancel))
+                        st.rerun()
+                else:
+                    st.info("No working orders")
+
             # Update chart based on trade action
             if st.session_state.trade_action:
                 current_layout = st.session_state.chart_layout
                 update_chart(
-                    st.session_state.current_data,
+                    current_data(),
                     selected_symbol,
                     timeframe,
                     st.session_state.cutoff_index,
@@ -679,47 +945,158 @@ def main():
 
                 with col1:
                     st.subheader("Current Positions")
-                    conn = sqlite3.connect("trading.db")
-                    positions_df = pd.read_sql_query(
-                        """
-                        SELECT symbol, quantity, avg_price, total_cost, market
-                        FROM assets 
-                        WHERE user_id = ? AND quantity > 0
-                    """,
-                        conn,
-                        params=(st.session_state.user_id,),
+                    # Görüntülenen sembolü replay fiyatından değerle
+                    replay_index = st.session_state.cutoff_index or len(current_data())
+                    portfolio = value_portfolio(
+                        st.session_state.user_id,
+                        overrides={
+                            (selected_symbol, market): current_data().price(
+                                replay_index - 1
+                            )
+                        },
                     )
-                    conn.close()
 
-                    if not positions_df.empty:
-                        st.dataframe(positions_df)
+                    if not portfolio["positions"].empty:
+                        mcol1, mcol2, mcol3 = st.columns(3)
+                        mcol1.metric("Equity", f"${portfolio['equity']:,.2f}")
+                        mcol2.metric("Cash", f"${portfolio['cash']:,.2f}")
+                        mcol3.metric(
+                            "Unrealized P&L", f"${portfolio['unrealized_pnl']:,.2f}"
+                        )
+                        st.dataframe(portfolio["positions"], hide_index=True)
+                        st.caption("Exposure by market")
+                        st.dataframe(portfolio["exposure"], hide_index=True)
+                        if portfolio["unpriced"]:
+                            st.warning(
+                                "No price available for: "
+                                + ", ".join(portfolio["unpriced"])
+                            )
                     else:
                         st.info("No active positions")
 
                 with col2:
                     st.subheader("Transaction History")
-                    conn = sqlite3.connect("trading.db")
-                    transactions_df = pd.read_sql_query(
-                        """
-                        SELECT symbol, type, quantity, price, total_amount, 
-                               profit_loss, timestamp, chart_timestamp, market
-                        FROM transactions 
-                        WHERE user_id = ?
-                        ORDER BY timestamp DESC
-                        LIMIT 10
-                    """,
-                        conn,
-                        params=(st.session_state.user_id,),
-                    )
-                    conn.close()
+                    stats = get_user_stats(st.session_state.user_id)
+                    scol1, scol2, scol3 = st.columns(3)
+                    scol1.metric("Realized P&L", f"${stats['realized_pnl']:,.2f}")
+                    scol2.metric("Trades", f"{stats['trade_count']:,}")
+                    scol3.metric("Turnover", f"${stats['turnover']:,.2f}")
+
+                    transactions_df = get_recent_transactions(st.session_state.user_id)
 
                     if not transactions_df.empty:
                         st.dataframe(transactions_df)
+                        with st.expander("Daily P&L"):
+                            st.dataframe(
+                                get_daily_pnl(st.session_state.user_id),
+                                hide_index=True,
+                            )
                     else:
                         st.info("No transactions yet")
 
+                    with st.expander("Leaderboard"):
+                        st.dataframe(get_leaderboard(), hide_index=True)
+
+                    with st.expander("Export History"):
+                        render_history_io(st.session_state.user_id)
+
+    # Market-wide scanner
+    with st.expander(f"Market Scanner ({market} {timeframe})"):
+        with st.form("scanner_form"):
+            scol1, scol2 = st.columns(2)
+            scan_indicator = scol1.selectbox("Indicator", list(indicators.keys()))
+            scan_lookback = scol2.number_input(
+                "Signal within last N bars", min_value=1, value=5
+            )
+            run_scan = st.form_submit_button(
+                f"Scan {len(st.session_state.symbols)} symbols"
+            )
+
+        if run_scan and st.session_state.symbols:
+            progress = st.progress(0.0)
+            results_placeholder = st.empty()
+            matches, errors = [], 0
+            completed, total = 0, len(st.session_state.symbols)
+            for result, completed, total in scan_market(
+                scan_indicator,
+                market,
+                st.session_state.symbols,
+                timeframe,
+                lookback=int(scan_lookback),
+            ):
+                progress.progress(completed / total, f"{completed}/{total} scanned")
+                if result is None:
+                    continue
+                if "error" in result:
+                    errors += 1
+                    continue
+                matches.append(result)
+                results_placeholder.dataframe(pd.DataFrame(matches), hide_index=True)
+            st.session_state.scan_results = matches
+            st.caption(
+                f"{len(matches)} matches, {completed} of {total} symbols scanned"
+                + (f", {errors} failed" if errors else "")
+            )
+        elif st.session_state.get("scan_results"):
+            st.dataframe(pd.DataFrame(st.session_state.scan_results), hide_index=True)
+
+    with st.expander(f"Basket Correlation ({market} {timeframe})"):
+        with st.form("correlation_form"):
+            basket = st.multiselect(
+                "Symbols",
+                st.session_state.symbols,
+                default=st.session_state.get("basket", []),
+            )
+            run_correlation = st.form_submit_button("Compare")
+
+        if run_correlation and len(basket) >= 2:
+            st.session_state.basket = basket
+            with st.spinner(f"Loading {len(basket)} symbols..."):
+                correlation, strength, n_bars, skipped = basket_analysis(
+                    market, basket, timeframe
+                )
+            if skipped:
+                st.warning(f"No data for {', '.join(skipped)}, left out")
+            st.session_state.basket_result = (
+                (correlation, strength, n_bars) if n_bars else None
+            )
+            if not n_bars:
+                st.warning("Fewer than two symbols with data to compare")
+        elif run_correlation:
+            st.warning("Pick at least two symbols")
+
+        if st.session_state.get("basket_result"):
+            correlation, strength, n_bars = st.session_state.basket_result
+            st.caption(f"Log-return correlation over {n_bars} bar times")
+            heatmap = go.Figure(
+                go.Heatmap(
+                    z=correlation.to_numpy(),
+                    x=correlation.columns,
+                    y=correlation.index,
+                    zmin=-1,
+                    zmax=1,
+                    colorscale="RdBu",
+                )
+            )
+            heatmap.update_layout(
+                template="plotly_dark",
+                height=max(400, 18 * len(correlation)),
+                yaxis={"autorange": "reversed"},
+            )
+            st.plotly_chart(heatmap, use_container_width=True)
+            st.dataframe(strength, hide_index=True)
+
+    # Debug panel with per-rerun timings
+    if st.sidebar.checkbox("Show Timings", key="show_timings"):
+        st.sidebar.subheader("Rerun Timings")
+        display_timings()
+    log_rerun_timings(
+        user_id=st.session_state.user_id, symbol=st.session_state.selected_symbol
+    )
+
 
 if __name__ == "__main__":
-    init_db()
-    init_user(1)  # Demo user'ı başlat
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    ensure_db()
     main()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))  # synthetic data
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Scratch working directory for trading.db, the archive and snapshots"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def trading_db(workdir):
+    """Fresh trading.db with user 1"""
+    from utils.db_utils import init_db, init_user
+
+    init_db()
+    init_user(1)
+    return workdir / "trading.db"
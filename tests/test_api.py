@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("tvDatafeed")
+
+from fastapi import HTTPException, Request
+
+import api
+from synthetic import make_ohlcv
+from utils.bars import Bars
+from utils.db_utils import get_chart_trades
+from utils.orders import process_orders
+
+
+def _place(username, **fields):
+    defaults = {"market": "BIST", "symbol": "TEST", "quantity": 1}
+    order = api.OrderRequest(**{**defaults, "price": None, "timestamp": None, **fields})
+    request = Request({"type": "http", "headers": []})
+    return asyncio.run(api.place_order(request, username, order))
+
+
+def test_limit_order_fills_when_the_replay_crosses_it(trading_db):
+    bars = Bars.from_frame(make_ohlcv(200, freq="1h"), "BIST:TEST")
+    price = float(bars.high.max()) + 1  # Crossed on the first bar after placement
+    placed_at = str(bars.timestamp(99))
+    _place("api-trader", side="BUY", price=price, timestamp=placed_at)
+
+    user_id = api.login("api-trader")
+    trades, rejections = process_orders(user_id, "TEST", "BIST", bars, 100, 110)
+    assert not rejections
+    assert len(trades) == 1
+    filled = get_chart_trades(user_id, "TEST", "BIST")
+    assert len(filled) == 1
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"price": 10.0},  # Limit order without a chart time
+        {"price": 10.0, "timestamp": "not a date"},
+    ],
+)
+def test_invalid_limit_orders_are_rejected(trading_db, fields):
+    with pytest.raises(HTTPException) as error:
+        _place("api-trader", side="BUY", **fields)
+    assert error.value.status_code == 400
+
+
+def test_unparseable_range_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        api._load("BIST", "TEST", "1h", start="yesterday-ish")
+    assert error.value.status_code == 400
@@ -0,0 +1,29 @@
+import numpy as np
+
+from synthetic import make_ohlcv
+from utils.archive import append_bars, latest_close, read_range
+from utils.bars import Bars
+
+
+def test_archived_prices_match_memory(workdir):
+    frame = make_ohlcv(500, freq="1h", symbol="BIST:TEST")
+    frame["low"] += 0.001  # Prices float32 cannot hold exactly
+    bars = Bars.from_frame(frame, "BIST:TEST")
+    assert bars.low.dtype == np.float32
+
+    append_bars(bars, "1h")
+    archived = read_range("BIST:TEST", "1h")
+
+    for column in ("open", "high", "low", "close"):
+        for position in (0, 137, -1):
+            assert archived.price(position, column) == bars.price(position, column)
+    assert latest_close("BIST:TEST")[1] == bars.price(-1)
+
+
+def test_refreshed_last_bar_keeps_decimal_prices(workdir):
+    frame = make_ohlcv(50, freq="1h", symbol="BIST:TEST")
+    append_bars(Bars.from_frame(frame, "BIST:TEST"), "1h")
+    frame.iloc[-1, frame.columns.get_loc("close")] = 98.93
+    append_bars(Bars.from_frame(frame, "BIST:TEST"), "1h")
+
+    assert read_range("BIST:TEST", "1h").price(-1) == 98.93
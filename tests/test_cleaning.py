@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from utils import cleaning
+
+
+def _bist_week(server_tz):
+    """Hourly BIST session bars for one week, stamped naive in `server_tz`"""
+    days = pd.date_range("2024-03-04", periods=5, freq="D")  # Monday to Friday
+    session = [day + pd.Timedelta(hours=hour) for day in days for hour in range(10, 18)]
+    exchange = pd.DatetimeIndex(session).tz_localize("Europe/Istanbul")
+    index = exchange.tz_convert(server_tz).tz_localize(None)
+    close = np.linspace(100, 101, len(index))
+    frame = pd.DataFrame(
+        {"open": close, "high": close, "low": close, "close": close, "volume": 1.0},
+        index=index,
+    )
+    return frame, exchange
+
+
+def test_monday_open_is_kept_on_a_server_west_of_the_exchange(monkeypatch):
+    # 10:00 Monday in Istanbul is 21:00 Sunday in Honolulu
+    monkeypatch.setattr(cleaning, "BAR_TIMEZONE", "Pacific/Honolulu")
+    frame, exchange = _bist_week("Pacific/Honolulu")
+    assert frame.index[0].weekday() == 6
+
+    cleaned, report = cleaning.clean_bars(frame, "BIST")
+    assert report["off_session"] == 0
+    assert len(cleaned) == len(frame)
+
+
+def test_weekend_bars_are_dropped_in_exchange_time(monkeypatch):
+    monkeypatch.setattr(cleaning, "BAR_TIMEZONE", "Pacific/Honolulu")
+    frame, exchange = _bist_week("Pacific/Honolulu")
+    # 11:00 Saturday in Istanbul is still 22:00 Friday in Honolulu
+    saturday = pd.Timestamp("2024-03-09 11:00", tz="Europe/Istanbul")
+    stray = frame.iloc[[-1]].set_axis(
+        [saturday.tz_convert("Pacific/Honolulu").tz_localize(None)]
+    )
+    cleaned, report = cleaning.clean_bars(pd.concat([frame, stray]), "BIST")
+    assert report["off_session"] == 1
+    assert len(cleaned) == len(frame)
+
+    aware = frame.set_axis(exchange)
+    cleaned, report = cleaning.clean_bars(aware, "BIST")
+    assert report["off_session"] == 0
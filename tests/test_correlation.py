@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("tvDatafeed")
+
+from synthetic import make_ohlcv
+from utils import market_data
+from utils.correlation import basket_analysis
+
+
+def test_basket_skips_symbols_that_fail_to_load(workdir, monkeypatch):
+    def fetch(full_symbol, exchange, interval, *args, **kwargs):
+        if full_symbol == "BIST:FAIL":
+            raise ConnectionError("upstream down")
+        if full_symbol == "BIST:EMPTY":
+            return None
+        seed = sum(map(ord, full_symbol))
+        return make_ohlcv(300, freq="1h", seed=seed, symbol=full_symbol)
+
+    monkeypatch.setattr(market_data, "fetch_market_data", fetch)
+
+    correlation, strength, n_bars, skipped = basket_analysis(
+        "BIST", ["AAA", "FAIL", "BBB", "EMPTY", "CCC"], "1h"
+    )
+    assert skipped == ["FAIL", "EMPTY"]
+    assert list(correlation.columns) == ["AAA", "BBB", "CCC"]
+    assert len(strength) == 3
+    assert n_bars > 0
+
+
+def test_basket_with_one_loaded_symbol_is_empty(workdir, monkeypatch):
+    def fetch(full_symbol, exchange, interval, *args, **kwargs):
+        if full_symbol == "BIST:FAIL":
+            raise ConnectionError("upstream down")
+        return make_ohlcv(300, freq="1h", symbol=full_symbol)
+
+    monkeypatch.setattr(market_data, "fetch_market_data", fetch)
+
+    correlation, strength, n_bars, skipped = basket_analysis(
+        "BIST", ["AAA", "FAIL"], "1h"
+    )
+    assert skipped == ["FAIL"]
+    assert correlation.empty and strength.empty and n_bars == 0
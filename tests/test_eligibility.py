@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("tvDatafeed")
+
+from synthetic import make_ohlcv
+from utils.archive import append_bars
+from utils.bars import Bars
+from utils.eligibility import EligibilityIndex, pick_random_symbol
+
+
+def _load(symbol):
+    """Fetch-and-archive stand-in: FAIL raises, EMPTY has no bars"""
+    if symbol == "FAIL":
+        raise ConnectionError("upstream down")
+    if symbol == "EMPTY":
+        return None
+    start = pd.Timestamp.now().floor("h") - pd.Timedelta(hours=499)
+    frame = make_ohlcv(500, freq="1h", start=start, symbol=f"BIST:{symbol}")
+    bars = Bars.from_frame(frame, f"BIST:{symbol}")
+    append_bars(bars, "1h")
+    return bars
+
+
+def test_empty_archive_falls_back_to_loading_candidates(workdir):
+    index = EligibilityIndex("BIST", "1h")  # Nothing archived, so an empty pool
+    symbol, bars = pick_random_symbol(
+        index, ["CUR", "FAIL", "EMPTY", "GOOD"], _load, exclude="CUR", attempts=3
+    )
+    assert symbol == "GOOD"
+    assert len(bars) == 500
+    assert index.symbols == ["GOOD"]
+
+
+def test_gives_up_after_the_attempts(workdir):
+    index = EligibilityIndex("BIST", "1h")
+    loaded = []
+
+    def load(symbol):
+        loaded.append(symbol)
+        return None
+
+    symbols = [f"S{i}" for i in range(10)]
+    assert pick_random_symbol(index, symbols, load, attempts=4) == (None, None)
+    assert len(loaded) == 4 and len(set(loaded)) == 4
+
+
+def test_ineligible_symbol_is_used_when_nothing_else_loads(workdir):
+    index = EligibilityIndex("BIST", "1h")
+    short = Bars.from_frame(make_ohlcv(50, freq="1h"), "BIST:SHORT")
+
+    def load(symbol):
+        return short if symbol == "SHORT" else None
+
+    symbol, bars = pick_random_symbol(index, ["SHORT", "EMPTY"], load, attempts=2)
+    assert symbol == "SHORT" and bars is short
+    assert len(index) == 0
@@ -0,0 +1,43 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+from synthetic import make_ohlcv
+from utils.bars import Bars
+from utils.db_utils import add_order
+from utils.orders import process_orders
+
+
+def test_concurrent_processing_fills_each_order_once(trading_db):
+    bars = Bars.from_frame(make_ohlcv(200, freq="1h"), "BIST:TEST")
+    placed_at = pd.Timestamp(bars.timestamp(0))
+    price = float(bars.high.max()) + 1  # Crossed on the first eligible bar
+    for _ in range(20):
+        add_order(1, "TEST", "BIST", "BUY", "LIMIT", 1, price, placed_at)
+
+    barrier = threading.Barrier(4)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(process_orders(1, "TEST", "BIST", bars, 0, len(bars)))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = sqlite3.connect(trading_db)
+    transactions = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    statuses = dict(
+        conn.execute("SELECT status, COUNT(*) FROM orders GROUP BY status").fetchall()
+    )
+    position = conn.execute("SELECT quantity FROM assets").fetchone()[0]
+    conn.close()
+
+    assert transactions == 20
+    assert statuses == {"FILLED": 20}
+    assert position == 20
+    assert sum(len(trades) for trades, _ in results) == 20
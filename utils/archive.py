@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .bars import COLUMNS, Bars
+from .config import (
+    ARCHIVE_DIR,
+    ARCHIVE_INDEX_STRIDE,
+    TIMEFRAME_INTERVALS,
+    TIMEFRAMES,
+)
+from .profiling import profiled
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+# Append-only columnar archive, one directory per symbol/timeframe:
+#   timestamps.i8 / open.f8 / ... raw little-endian column files
+#   index.i8       timestamp of every ARCHIVE_INDEX_STRIDE-th row
+#   meta.json      committed row count (written last, so readers never see
+#                  a half-appended row)
+DTYPES = {"timestamps": np.dtype("<i8")}
+DTYPES.update({column: np.dtype("<f8") for column in COLUMNS})
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def archive_path(symbol, timeframe):
+    return os.path.join(ARCHIVE_DIR, symbol.replace(":", "_"), timeframe)
+
+
+@contextmanager
+def _writer_lock(path):
+    """Exclusive writer lock on `path` across threads and processes.
+
+    Scanner workers, the API, the eligibility crawler and the app all append
+    to (and truncate) the same files, so a thread lock alone is not enough.
+    """
+    with _locks_guard:
+        lock = _locks.setdefault(path, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _stored(values, column):
+    """Column values as stored; float32 prices are widened via their shortest
+    decimal (12.3, not 12.300000190734863), the same value Bars.price() gives
+    """
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        values = values.astype(str).astype(np.float64)
+    return np.ascontiguousarray(values, dtype=DTYPES[column])
+
+
+def _column_file(path, column):
+    dtype = DTYPES[column]
+    return os.path.join(path, f"{column}.{dtype.kind}{dtype.itemsize}")
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+
+def _memmap(path, column, length):
+    if length == 0:
+        return np.empty(0, dtype=DTYPES[column])
+    return np.memmap(
+        _column_file(path, column), dtype=DTYPES[column], mode="r", shape=(length,)
+    )
+
+
+def _sparse_index(path, length):
+    index_file = os.path.join(path, "index.i8")
+    count = (length + ARCHIVE_INDEX_STRIDE - 1) // ARCHIVE_INDEX_STRIDE
+    if count == 0:
+        return np.empty(0, dtype=DTYPES["timestamps"])
+    return np.fromfile(index_file, dtype=DTYPES["timestamps"], count=count)
+
+
+@profiled("archive.append_bars")
+def append_bars(bars, timeframe):
+    """Add bars newer than the archive's last bar; returns rows appended.
+
+    The last archived bar is rewritten when `bars` contains the same
+    timestamp, since the most recent bar of a fetch is usually still forming.
+    """
+    path = archive_path(bars.symbol, timeframe)
+    os.makedirs(path, exist_ok=True)
+    with _writer_lock(path):
+        meta = _read_meta(path) or {"symbol": bars.symbol, "length": 0}
+        length = meta["length"]
+
+        # Drop rows left behind by an interrupted append
+        for column in DTYPES:
+            column_file = _column_file(path, column)
+            if os.path.exists(column_file):
+                os.truncate(column_file, length * DTYPES[column].itemsize)
+
+        start = 0
+        if length:
+            last = int(_memmap(path, "timestamps", length)[-1])
+            start = int(np.searchsorted(bars.timestamps, last, side="left"))
+            if start < len(bars) and bars.timestamps[start] == last:
+                # Refresh the still-forming last bar in place
+                for column in COLUMNS:
+                    value = getattr(bars, column)[start : start + 1]
+                    with open(_column_file(path, column), "r+b") as f:
+                        f.seek((length - 1) * DTYPES[column].itemsize)
+                        f.write(_stored(value, column).tobytes())
+                start += 1
+
+        new_rows = len(bars) - start
+        if new_rows <= 0:
+            return 0
+
+        for column in DTYPES:
+            values = getattr(bars, column)[start:]
+            with open(_column_file(path, column), "ab") as f:
+                f.write(_stored(values, column).tobytes())
+
+        # Extend the sparse index with every stride boundary we crossed
+        first_entry = (length + ARCHIVE_INDEX_STRIDE - 1) // ARCHIVE_INDEX_STRIDE
+        rows = np.arange(
+            first_entry * ARCHIVE_INDEX_STRIDE, length + new_rows, ARCHIVE_INDEX_STRIDE
+        )
+        index_file = os.path.join(path, "index.i8")
+        if os.path.exists(index_file):
+            os.truncate(index_file, first_entry * DTYPES["timestamps"].itemsize)
+        boundaries = bars.timestamps[start + rows - length]
+        with open(index_file, "ab") as f:
+            f.write(boundaries.astype(DTYPES["timestamps"]).tobytes())
+
+        meta["length"] = length + new_rows
+        _write_meta(path, meta)
+        return new_rows
+
+
+def _locate(path, length, timestamp, side):
+    """Row position of `timestamp`, reading only one stride of timestamps"""
+    sparse = _sparse_index(path, length)
+    block = max(int(np.searchsorted(sparse, timestamp, side=side)) - 1, 0)
+    lo = block * ARCHIVE_INDEX_STRIDE
+    hi = min(lo + 2 * ARCHIVE_INDEX_STRIDE, length)
+    timestamps = _memmap(path, "timestamps", length)
+    return lo + int(np.searchsorted(timestamps[lo:hi], timestamp, side=side))
+
+
+@profiled("archive.read_range")
+def read_range(symbol, timeframe, start=None, end=None):
+    """Memory-mapped Bars for start <= time <= end (pandas Timestamps or None)"""
+    path = archive_path(symbol, timeframe)
+    meta = _read_meta(path)
+    if not meta or meta["length"] == 0:
+        return None
+    length = meta["length"]
+
+    lo = 0 if start is None else _locate(path, length, start.value, "left")
+    hi = length if end is None else _locate(path, length, end.value, "right")
+    if hi <= lo:
+        return None
+
+    return Bars(
+        meta["symbol"],
+        _memmap(path, "timestamps", length)[lo:hi],
+        *(_memmap(path, column, length)[lo:hi] for column in COLUMNS),
+    )
+
+
+def archive_span(symbol, timeframe):
+    """(first, last, length) of the archived history, or None"""
+    path = archive_path(symbol, timeframe)
+    meta = _read_meta(path)
+    if not meta or meta["length"] == 0:
+        return None
+    timestamps = _memmap(path, "timestamps", meta["length"])
+    return int(timestamps[0]), int(timestamps[-1]), meta["length"]
+
+
+def is_stale(bars, timeframe):
+    """True when the last bar is more than one interval old"""
+    age = pd.Timestamp.now().value - int(bars.timestamps[-1])
+    return age > TIMEFRAME_INTERVALS.get(timeframe, 0) * 10**9
+
+
+def latest_close(symbol):
+    """(timestamp, close) of the newest archived bar across timeframes"""
+    latest = None
+    for timeframe in TIMEFRAMES:
+        path = archive_path(symbol, timeframe)
+        meta = _read_meta(path)
+        if not meta or meta["length"] == 0:
+            continue
+        length = meta["length"]
+        timestamp = int(_memmap(path, "timestamps", length)[-1])
+        if latest is None or timestamp > latest[0]:
+            latest = (timestamp, float(_memmap(path, "close", length)[-1]))
+    return latest
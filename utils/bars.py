@@ -0,0 +1,176 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ("open", "high", "low", "close")
+COLUMNS = PRICE_COLUMNS + ("volume",)
+
+
+def _compact(values):
+    """Downcast to float32 when that keeps every distinct value distinct"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    narrow = values.astype(np.float32)
+    finite = np.isfinite(values)
+    if not np.array_equal(np.isfinite(narrow), finite):
+        return values  # Out of float32 range
+
+    distinct = np.unique(values[finite])
+    if len(distinct) < 2:
+        return narrow
+    # Half the smallest step between prices (the effective tick size)
+    tolerance = np.diff(distinct).min() / 2
+    error = np.abs(narrow[finite].astype(np.float64) - values[finite]).max()
+    return narrow if error < tolerance else values
+
+
+class Bars:
+    """Compact OHLCV container backed by contiguous NumPy column arrays.
+
+    Timestamps are int64 nanoseconds since the epoch, prices are float32
+    when that is lossless at the data's tick size, and the symbol is stored
+    once. Slicing with `view` shares memory with the parent.
+    """
+
+    __slots__ = (
+        "symbol",
+        "timestamps",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volume",
+        "_base",
+        "_start",
+        "_labels",
+        "_graph",  # IndicatorGraph of the base bars, see utils.indicator_graph
+    )
+
+    def __init__(
+        self, symbol, timestamps, open, high, low, close, volume, _base=None, _start=0
+    ):
+        self.symbol = symbol
+        self.timestamps = timestamps
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self._base = _base
+        self._start = _start
+        self._labels = None
+        self._graph = None
+
+    @classmethod
+    def from_frame(cls, data, symbol=None):
+        """Build from a TvDatafeed-style DataFrame"""
+        if symbol is None:
+            if "symbol" in data and len(data):
+                symbol = data["symbol"].iloc[0]
+            else:
+                symbol = data.attrs.get("symbol")
+        timestamps = np.ascontiguousarray(
+            np.asarray(pd.DatetimeIndex(data.index), dtype="datetime64[ns]")
+        ).view(np.int64)
+        return cls(
+            symbol,
+            timestamps,
+            *(_compact(data[column].to_numpy()) for column in COLUMNS),
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def base(self):
+        return self._base if self._base is not None else self
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + sum(getattr(self, c).nbytes for c in COLUMNS)
+
+    @property
+    def index(self):
+        """DatetimeIndex sharing memory with the timestamp array"""
+        return pd.DatetimeIndex(
+            self.timestamps.view("datetime64[ns]"), name="datetime"
+        )
+
+    def timestamp(self, position):
+        """Bar time at `position` as a pandas Timestamp"""
+        return pd.Timestamp(int(self.timestamps[position]))
+
+    def position_after(self, timestamp):
+        """Number of bars at or before `timestamp` (a cutoff index)"""
+        return int(
+            np.searchsorted(self.timestamps, pd.Timestamp(timestamp).value, side="right")
+        )
+
+    def price(self, position, column="close"):
+        """Python float for `column` at `position` (safe to store in SQLite)"""
+        value = getattr(self, column)[position]
+        # float32 repr is the shortest decimal that round-trips, e.g. 12.3
+        return float(str(value)) if value.dtype == np.float32 else float(value)
+
+    def view(self, stop=None, start=None):
+        """Zero-copy slice of bars [start:stop]"""
+        window = slice(start, stop)
+        first = window.indices(len(self))[0]
+        return Bars(
+            self.symbol,
+            self.timestamps[window],
+            *(getattr(self, c)[window] for c in COLUMNS),
+            _base=self.base,
+            _start=self._start + first,
+        )
+
+    def labels(self):
+        """ISO second-resolution labels used for the category x axis"""
+        base = self.base
+        if base._labels is None:
+            base._labels = np.datetime_as_string(
+                base.timestamps.view("datetime64[ns]"), unit="s"
+            )
+        return base._labels[self._start : self._start + len(self)]
+
+    def candlestick_kwargs(self):
+        """Plotly Candlestick arguments built from the column arrays"""
+        return {
+            "x": self.labels(),
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+        }
+
+    def to_frame(self):
+        """DataFrame view over the columns (for pandas-based indicators)"""
+        frame = pd.DataFrame(
+            {c: getattr(self, c) for c in COLUMNS}, index=self.index, copy=False
+        )
+        frame.attrs["symbol"] = self.symbol
+        return frame
+
+    def save(self, path):
+        """Write one .npy file per column plus meta.json into directory `path`"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "timestamps.npy"), self.timestamps)
+        for column in COLUMNS:
+            np.save(os.path.join(path, f"{column}.npy"), getattr(self, column))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"symbol": self.symbol, "length": len(self)}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Read bars written by `save`; columns are memory-mapped by default"""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(
+            meta["symbol"],
+            np.load(os.path.join(path, "timestamps.npy"), mmap_mode=mmap_mode),
+            *(
+                np.load(os.path.join(path, f"{column}.npy"), mmap_mode=mmap_mode)
+                for column in COLUMNS
+            ),
+        )
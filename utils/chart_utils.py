@@ -1,21 +1,68 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
-import pandas as pd
 from helpers.heikinashi import heikin_ashi
+from .bars import Bars
+from .config import (
+    CHART_WEBGL_THRESHOLD,
+    STATS_ATR_PERIOD,
+    STATS_VOLATILITY_BARS,
+    STATS_VOLUME_BARS,
+)
+from .indicator_graph import node_values
+from .profiling import profiled, timed
+from .statistics import rolling_statistics
+
+
+def find_nearest_bars(timestamps, bars):
+    """En yakın bar pozisyonlarını bul (vektörel)"""
+    times = np.array([pd.Timestamp(t).value for t in timestamps], dtype=np.int64)
+    bar_times = bars.timestamps
+    if len(bar_times) < 2:
+        return np.zeros(len(times), dtype=np.intp)
+    right = np.clip(np.searchsorted(bar_times, times), 1, len(bar_times) - 1)
+    left = right - 1
+    return np.where(times - bar_times[left] <= bar_times[right] - times, left, right)
 
 
-def find_nearest_bar(timestamp, data_index):
-    """En yakın bar zamanını bul"""
-    return data_index[abs(data_index - timestamp).argmin()]
+def scatter_trace(n_points, **kwargs):
+    """go.Scatter, or WebGL go.Scattergl once the overlays get dense"""
+    if CHART_WEBGL_THRESHOLD is not None and n_points > CHART_WEBGL_THRESHOLD:
+        return go.Scattergl(**kwargs)
+    return go.Scatter(**kwargs)
+
+
+def add_markers(fig, bars, labels, markers, group, style, n_points):
+    """Add one marker trace per group instead of one trace per marker"""
+    positions = find_nearest_bars([marker["timestamp"] for marker in markers], bars)
+    groups = {}
+    for position, marker in zip(positions, markers):
+        groups.setdefault(group(marker), []).append((position, marker["price"]))
+
+    for name, points in groups.items():
+        bar_positions, prices = zip(*points)
+        fig.add_trace(
+            scatter_trace(
+                n_points,
+                x=labels[list(bar_positions)],
+                y=prices,
+                mode="markers",
+                name=name,
+                **style(name),
+            )
+        )
 
 
 def calculate_ma(data, period, ma_type="SMA"):
-    """Calculate Moving Average"""
-    if ma_type == "EMA":
-        return data["close"].ewm(span=period, adjust=False).mean()
-    return data["close"].rolling(window=period).mean()
+    """Calculate Moving Average (shared per dataset via the indicator graph)"""
+    if not isinstance(data, Bars):
+        data = Bars.from_frame(data)
+    kind = "ema" if ma_type == "EMA" else "sma"  # Anything else falls back to SMA
+    return node_values(data, (kind, "close", int(period)))
 
 
+@profiled("create_candlestick_chart")
 def create_candlestick_chart(
     data,
     symbol,
@@ -39,23 +86,24 @@ def create_candlestick_chart(
         "1M": "%d.%m.%Y",
     }
 
-    display_data = data.iloc[:cutoff_index] if cutoff_index is not None else data
+    if not isinstance(data, Bars):
+        data = Bars.from_frame(data, symbol)
+
+    display_data = data.view(cutoff_index)
+    # Kısa formatlı tarihler (kategori ekseni için)
+    candles = display_data.candlestick_kwargs()
 
     # Convert to Heikin-Ashi if selected
     if chart_type == "heikinashi":
-        display_data = heikin_ashi(display_data)
-
-    # Tarihleri kısa formata çevirmek için
-    display_data['date'] = pd.to_datetime(display_data.index).strftime('%Y-%m-%dT%H:%M:%S')
+        with timed("heikin_ashi"):
+            ha_data = heikin_ashi(display_data.to_frame())
+        for column in ("open", "high", "low", "close"):
+            candles[column] = ha_data[column].to_numpy()
 
     fig = go.Figure(
         data=[
             go.Candlestick(
-                x=display_data['date'],  # Artık kısa formatta tarihler
-                open=display_data["open"],
-                high=display_data["high"],
-                low=display_data["low"],
-                close=display_data["close"],
+                **candles,
                 name="Heikin-Ashi" if chart_type == "heikinashi" else "Candlesticks",
             )
         ]
@@ -129,70 +177,68 @@ def create_candlestick_chart(
         }
     )
 
-    if trades:
-        for trade in trades:
-            # İşlem zamanını en yakın bara eşleştir
-            nearest_timestamp = find_nearest_bar(trade["timestamp"], display_data.index)
+    labels = candles["x"]
+    trades = trades or []
+    indicator_signals = indicator_signals or []
+    # Overlays switch to WebGL together so styling stays consistent
+    n_points = len(trades) + len(indicator_signals)
+    n_points += len(moving_averages or []) * len(display_data)
 
-            fig.add_trace(
-                go.Scatter(
-                    x=[nearest_timestamp],
-                    y=[trade["price"]],
-                    mode="markers",
-                    marker=dict(
-                        symbol=(
-                            "triangle-up" if trade["type"] == "BUY" else "triangle-down"
-                        ),
-                        size=15,
-                        color="green" if trade["type"] == "BUY" else "red",
-                    ),
-                    name=trade["type"],
-                    showlegend=False,
-                )
-            )
+    if trades and len(display_data):
+        # İşlemleri en yakın bara eşleştir, her yön tek trace
+        add_markers(
+            fig,
+            display_data,
+            labels,
+            trades,
+            group=lambda trade: trade["type"],
+            style=lambda side: dict(
+                marker=dict(
+                    symbol="triangle-up" if side == "BUY" else "triangle-down",
+                    size=15,
+                    color="green" if side == "BUY" else "red",
+                ),
+                showlegend=False,
+            ),
+            n_points=n_points,
+        )
 
     # Add indicator signals if available
-    if indicator_signals is not None:
-        for signal in indicator_signals:
-            # İndikatör sinyallerini de en yakın bara eşleştir
-            nearest_timestamp = find_nearest_bar(
-                signal["timestamp"], display_data.index
-            )
-
-            fig.add_trace(
-                go.Scatter(
-                    x=[nearest_timestamp],
-                    y=[signal["price"]],
-                    mode="markers",
-                    marker=dict(
-                        symbol=(
-                            "triangle-up" if signal["type"] == "AL" else "triangle-down"
-                        ),
-                        size=15,
-                        color=(
-                            "#00FFFF" if signal["type"] == "AL" else "#FF69B4"
-                        ),  # Cyan for buy, Hot Pink for sell
-                        line=dict(color="white", width=1),  # Beyaz kenar çizgisi
+    if indicator_signals and len(display_data):
+        # İndikatör sinyallerini de en yakın bara eşleştir
+        add_markers(
+            fig,
+            display_data,
+            labels,
+            indicator_signals,
+            group=lambda signal: f"{signal['indicator']} {signal['type']}",
+            style=lambda name: dict(
+                marker=dict(
+                    symbol=(
+                        "triangle-up" if name.endswith(" AL") else "triangle-down"
                     ),
-                    name=f"{signal['indicator']} {signal['type']}",
-                    showlegend=True,
-                )
-            )
+                    size=15,
+                    color=(
+                        "#00FFFF" if name.endswith(" AL") else "#FF69B4"
+                    ),  # Cyan for buy, Hot Pink for sell
+                    line=dict(color="white", width=1),  # Beyaz kenar çizgisi
+                ),
+                showlegend=True,
+            ),
+            n_points=n_points,
+        )
 
     # Add moving averages if available
     if moving_averages:
         for ma in moving_averages:
-            ma_data = calculate_ma(data, ma["period"], ma["type"])
-            display_ma = (
-                ma_data.iloc[:cutoff_index] if cutoff_index is not None else ma_data
-            )
-            
-            # Tarihleri kısa formata çevir
-            ma_dates = pd.to_datetime(display_data.index).strftime('%Y-%m-%dT%H:%M:%S')
+            with timed("calculate_ma"):
+                ma_data = calculate_ma(data, ma["period"], ma["type"])
+            display_ma = ma_data[: len(display_data)]
 
             fig.add_trace(
-                go.Scatter(
-                    x=ma_dates,  # Kısa formatlı tarihleri kullan
+                scatter_trace(
+                    n_points,
+                    x=labels,  # Kısa formatlı tarihleri kullan
                     y=display_ma,
                     mode="lines",
                     name=f"{ma['type']}-{ma['period']}",
@@ -205,12 +251,35 @@ def create_candlestick_chart(
 
 
 def display_statistics(data):
-    """Display market statistics"""
+    """Display market statistics as of the last bar of `data`"""
+    stats = rolling_statistics(data)
+    if not stats:
+        return
     st.subheader("Statistics")
     col1, col2, col3 = st.columns(3)
-    col1.metric("Current Price", f"{data['close'].iloc[-1]:.2f}")
-    col2.metric(
-        "Daily Change",
-        f"{((data['close'].iloc[-1] - data['open'].iloc[-1]) / data['open'].iloc[-1] * 100):.2f}%",
+    col1.metric("Current Price", f"{stats['close']:.2f}")
+    col2.metric("Daily Change", f"{stats['daily_change_pct']:.2f}%")
+    col3.metric(
+        "Volume",
+        f"{stats['volume']:,.0f}",
+        f"{stats['volume_percentile']:.0f}th pct of {STATS_VOLUME_BARS} bars",
+        delta_color="off",
+    )
+
+    col4, col5, col6 = st.columns(3)
+    col4.metric(
+        f"ATR ({STATS_ATR_PERIOD})",
+        f"{stats['atr']:.2f}",
+        f"{stats['atr_pct']:.2f}% of price",
+        delta_color="off",
+    )
+    col5.metric(
+        f"Realized Vol ({STATS_VOLATILITY_BARS} bars)",
+        f"{stats['volatility_pct']:.2f}%",
+    )
+    col6.metric(
+        "Session VWAP",
+        f"{stats['vwap']:.2f}",
+        f"{stats['vwap_distance_pct']:+.2f}% vs price",
+        delta_color="off",
     )
-    col3.metric("Volume", f"{data['volume'].iloc[-1]:,.0f}")
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
+
+from .config import BAR_TIMEZONE, CLEAN_FILL_LIMIT, CLEAN_SPIKE_MAD, MARKET_HOURS
+
+PRICE_COLUMNS = ("open", "high", "low", "close")
+DAY_NS = 86_400 * 10**9
+
+
+# Row stages: decide which bars survive, in which order. They only look at
+# the int64 timestamps (wall times in `tz`) and return an index or mask;
+# rows are taken once.
+
+
+def sort_order(timestamps, market, report, tz):
+    """Stable sort permutation, or None when the bars are already in order"""
+    report["sorted"] = bool(len(timestamps) > 1 and (np.diff(timestamps) < 0).any())
+    if not report["sorted"]:
+        return None
+    return np.argsort(timestamps, kind="stable")
+
+
+def duplicate_bars(timestamps, market, report, tz):
+    """Bars superseded by a later bar with the same timestamp (needs sorted input)"""
+    duplicate = np.zeros(len(timestamps), dtype=bool)
+    duplicate[:-1] = timestamps[1:] == timestamps[:-1]
+    report["duplicates"] = int(duplicate.sum())
+    return duplicate
+
+
+def off_session_bars(timestamps, market, report, tz):
+    """Intraday bars stamped on days the market does not trade.
+
+    The weekday is taken in the exchange's timezone, not the server's: a
+    Monday-open bar may still be Sunday evening in the timezone it was
+    stamped in.
+    """
+    hours = MARKET_HOURS.get(market, {})
+    trading_days = hours.get("trading_days", range(7))
+    off_session = np.zeros(len(timestamps), dtype=bool)
+    # Daily and slower bars may be stamped on any calendar day (1M on the 1st)
+    if len(trading_days) < 7 and len(timestamps) > 1:
+        if np.median(np.diff(timestamps)) < DAY_NS:
+            local = pd.DatetimeIndex(timestamps.view("datetime64[ns]")).tz_localize(
+                tz,
+                ambiguous=np.zeros(len(timestamps), dtype=bool),
+                nonexistent="shift_forward",
+            )
+            weekdays = local.tz_convert(hours.get("timezone", "UTC")).weekday
+            off_session = ~np.isin(weekdays, trading_days)
+    report["off_session"] = int(off_session.sum())
+    return off_session
+
+
+# Value stages: repair the taken columns in place, one column at a time
+
+
+def invalid_prices(columns, market, report):
+    """Non-finite or non-positive prices become missing"""
+    invalid = np.zeros(len(columns["close"]), dtype=bool)
+    for column in PRICE_COLUMNS:
+        bad = ~(columns[column] > 0) & ~np.isnan(columns[column])
+        bad |= np.isinf(columns[column])
+        columns[column][bad] = np.nan
+        invalid |= bad
+    report["invalid_prices"] = int(invalid.sum())
+
+
+def clip_ohlc(columns, market, report):
+    """Clip high/low so every bar contains its own open and close"""
+    body_high = np.fmax(columns["open"], columns["close"])
+    body_low = np.fmin(columns["open"], columns["close"])
+    high_clipped = columns["high"] < body_high
+    low_clipped = columns["low"] > body_low
+    np.fmax(columns["high"], body_high, out=columns["high"])
+    np.fmin(columns["low"], body_low, out=columns["low"])
+    report["ohlc_clipped"] = int((high_clipped | low_clipped).sum())
+
+
+def isolated_spikes(columns, market, report):
+    """Drop single bad ticks: a close that jumps away and straight back"""
+    report["spikes"] = 0
+    close = columns["close"]
+    if CLEAN_SPIKE_MAD is None or len(close) < 3:
+        return
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(close))
+    deviation = np.abs(returns - np.nanmedian(returns))
+    mad = np.nanmedian(deviation)
+    if not mad > 0:
+        return
+
+    threshold = CLEAN_SPIKE_MAD * mad
+    jump_in, jump_out = returns[:-1], returns[1:]
+    with np.errstate(invalid="ignore"):
+        spike = (
+            (np.abs(jump_in) > threshold)
+            & (np.abs(jump_out) > threshold)
+            & (np.sign(jump_in) != np.sign(jump_out))
+            & (np.abs(jump_in + jump_out) <= threshold)
+        )
+    rows = np.flatnonzero(spike) + 1
+    for column in PRICE_COLUMNS:
+        columns[column][rows] = np.nan
+    report["spikes"] = len(rows)
+
+
+def fill_gaps(columns, market, report):
+    """Forward-fill short price gaps; missing volume means nothing traded"""
+    report["prices_filled"] = 0
+    for column in PRICE_COLUMNS:
+        values = columns[column]
+        missing = np.isnan(values)
+        if not missing.any():
+            continue
+        positions = np.arange(len(values))
+        last_valid = np.maximum.accumulate(np.where(missing, -1, positions))
+        fillable = missing & (last_valid >= 0)
+        fillable &= positions - last_valid <= CLEAN_FILL_LIMIT
+        values[fillable] = values[last_valid[fillable]]
+        report["prices_filled"] += int(fillable.sum())
+
+    if "volume" in columns:
+        volume = columns["volume"]
+        missing = np.isnan(volume)
+        volume[missing] = 0
+        report["volume_filled"] = int(missing.sum())
+
+
+ROW_STAGES = (duplicate_bars, off_session_bars)
+VALUE_STAGES = (invalid_prices, isolated_spikes, fill_gaps, clip_ohlc)
+
+# Markets that trade around the clock have no sessions to filter
+PIPELINES = {
+    "BIST": (ROW_STAGES, VALUE_STAGES),
+    "NASDAQ": (ROW_STAGES, VALUE_STAGES),
+    "Forex": ((duplicate_bars,), VALUE_STAGES),
+    "Crypto": ((duplicate_bars,), VALUE_STAGES),
+}
+
+
+def clean_bars(data, market):
+    """Run the market's cleaning pipeline over a TvDatafeed frame.
+
+    Returns (cleaned frame, report of what each stage changed). The input
+    frame is left untouched; the columns are copied exactly once.
+    """
+    row_stages, value_stages = PIPELINES.get(market, (ROW_STAGES, VALUE_STAGES))
+    index = pd.DatetimeIndex(data.index)
+    timestamps = np.asarray(index, dtype="datetime64[ns]").view(np.int64)
+    # Aware indexes come out as UTC; naive ones are wall times of the source
+    if index.tz is not None:
+        tz = "UTC"
+    else:
+        tz = BAR_TIMEZONE or tzlocal()
+    report = {"rows_in": len(data)}
+
+    rows = sort_order(timestamps, market, report, tz)
+    if rows is not None:
+        timestamps = timestamps[rows]
+    drop = np.zeros(len(timestamps), dtype=bool)
+    for stage in row_stages:
+        drop |= stage(timestamps, market, report, tz)
+    if drop.any():
+        keep = np.flatnonzero(~drop)
+        rows = keep if rows is None else rows[keep]
+        timestamps = timestamps[keep]
+
+    columns = {}
+    for column in data.columns:
+        values = data[column].to_numpy()
+        if column in PRICE_COLUMNS or column == "volume":
+            values = values.astype(np.float64, copy=rows is None)
+        columns[column] = values if rows is None else values[rows]
+
+    for stage in value_stages:
+        stage(columns, market, report)
+    report["rows_out"] = len(timestamps)
+
+    cleaned_index = pd.DatetimeIndex(timestamps.view("datetime64[ns]"), name=index.name)
+    if index.tz is not None:
+        cleaned_index = cleaned_index.tz_localize("UTC").tz_convert(index.tz)
+    cleaned = pd.DataFrame(columns, index=cleaned_index, copy=False)
+    cleaned.attrs.update(data.attrs)
+    cleaned.attrs["cleaning"] = report
+    return cleaned, report
@@ -1,3 +1,5 @@
+from datetime import time
+
 MARKETS = ["BIST", "Forex", "Crypto", "NASDAQ"]
 
 TIMEFRAMES = ["1m", "5m", "15m", "30m", "1h", "4h", "1d", "1w", "1M"]
@@ -16,6 +18,33 @@ SYMBOL_PREFIXES = {
     "NASDAQ": "NASDAQ:",
 }
 
+MARKET_HOURS = {
+    "BIST": {
+        "open": time(10, 0),
+        "close": time(18, 0),
+        "trading_days": range(0, 5),  # Monday to Friday
+        "timezone": "Europe/Istanbul",
+    },
+    "NASDAQ": {
+        "open": time(9, 30),
+        "close": time(16, 0),
+        "trading_days": range(0, 5),
+        "timezone": "America/New_York",
+    },
+    "Forex": {
+        "open": time(0, 0),
+        "close": time(23, 59),
+        "trading_days": range(0, 7),  # All week
+        "timezone": "UTC",
+    },
+    "Crypto": {
+        "open": time(0, 0),
+        "close": time(23, 59),
+        "trading_days": range(0, 7),
+        "timezone": "UTC",
+    },
+}
+
 TIMEFRAME_INTERVALS = {
     "1m": 60,  # 60 seconds
     "5m": 300,  # 5 minutes
@@ -27,3 +56,93 @@ TIMEFRAME_INTERVALS = {
     "1w": 604800,  # 1 week
     "1M": 2592000,  # 1 month (30 days)
 }
+
+# Profiling
+PROFILING_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+METRICS_PORT = None  # e.g. 9108 to expose Prometheus metrics at /metrics
+
+# Shared dataset store
+DATASET_TTL = 300  # Seconds a loaded dataset is reused for new sessions
+DATASET_IDLE_SECONDS = 60  # Unreferenced datasets are evicted after this
+DATASET_MMAP_DIR = None  # e.g. "datasets" to memory-map shared bar arrays
+
+# Historical bar archive
+ARCHIVE_DIR = "archive"
+ARCHIVE_INDEX_STRIDE = 4096  # Rows between entries of the sparse time index
+
+# Portfolio valuation
+PORTFOLIO_PRICE_WORKERS = 8  # Concurrent price lookups for uncached symbols
+
+# Database and users
+DB_PATH = "trading.db"
+DB_TIMEOUT = 30  # Seconds to wait on a locked database
+INITIAL_BALANCE = 10000
+
+# Market scanner
+SCANNER_TIME_BUDGET = 120  # Seconds before a scan stops and returns what it has
+SCANNER_WORKERS = None  # Process pool size, None for os.cpu_count()
+SCANNER_BARS = 500  # Most recent bars each indicator is run on
+SCANNER_FETCH_WORKERS = 8  # Threads loading bars; fetches share the upstream scheduler
+
+# Upstream request scheduling (per upstream service)
+UPSTREAM_LIMITS = {
+    "tvdatafeed": {
+        "rate": 2.0,  # Requests per second
+        "burst": 5,
+        "timeout": 30,  # Seconds per attempt
+        "max_concurrency": 4,
+    },
+    "screener": {"rate": 0.5, "burst": 2, "timeout": 60, "max_concurrency": 1},
+}
+UPSTREAM_RETRIES = 3
+UPSTREAM_BACKOFF = (0.5, 8.0)  # Base and cap of exponential backoff in seconds
+UPSTREAM_FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+UPSTREAM_RESET_TIMEOUT = 30  # Seconds the circuit stays open
+
+# Charts
+CHART_WEBGL_THRESHOLD = 5000  # Overlay points above which WebGL traces are used
+
+# Market data cleaning
+CLEAN_FILL_LIMIT = 3  # Consecutive missing prices forward-filled
+CLEAN_SPIKE_MAD = 20  # Bad-tick threshold in median absolute returns, None to disable
+BAR_TIMEZONE = None  # Timezone of naive upstream bar times, None for the server's
+
+# HTTP API
+API_CACHE_SECONDS = 30  # Cache-Control max-age for bar and indicator responses
+API_SIGNAL_CACHE_SIZE = 256  # Indicator results kept per process
+API_TOKEN = None  # Bearer token required to place orders through the API, None to disable
+
+# Random symbol eligibility
+ELIGIBILITY_MIN_BARS = {  # Bars a symbol needs to be worth replaying, per timeframe
+    "1m": 300,
+    "5m": 300,
+    "15m": 300,
+    "30m": 300,
+    "1h": 300,
+    "4h": 300,
+    "1d": 250,  # ~1 year
+    "1w": 104,  # 2 years
+    "1M": 36,  # 3 years
+}
+ELIGIBILITY_MAX_IDLE_DAYS = 7  # Latest bar must be newer than this (or 2 bars)
+ELIGIBILITY_MIN_TURNOVER = {}  # Market -> minimum median close * volume, e.g. {"BIST": 1e6}
+ELIGIBILITY_REFRESH = 3600  # Seconds between re-checks of a market/timeframe
+ELIGIBILITY_IDLE = 900  # Seconds without use before a market/timeframe index is dropped
+RANDOM_SYMBOL_ATTEMPTS = 5  # Symbols fetched to find a replayable one when the pool is empty
+
+# Replay snapshots
+SNAPSHOT_DIR = "snapshots"
+
+# Statistics panel
+STATS_ATR_PERIOD = 14
+STATS_VOLATILITY_BARS = 20  # Window of the realized volatility
+STATS_VOLUME_BARS = 100  # Window the last volume is ranked against
+
+# Basket correlation
+CORRELATION_LOOKBACK = 500  # Bars of history a new basket starts from
+CORRELATION_MIN_OVERLAP = 20  # Shared returns needed before a pair is reported
+CORRELATION_FETCH_WORKERS = 8  # Concurrent loads of missing or stale symbols
+CORRELATION_CACHE_SIZE = 8  # Baskets whose running sums are kept per process
+
+# Trade history export / import
+HISTORY_CHUNK_ROWS = 100_000  # Rows per fetchmany / Parquet row group
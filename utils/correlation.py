@@ -0,0 +1,203 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    CORRELATION_CACHE_SIZE,
+    CORRELATION_FETCH_WORKERS,
+    CORRELATION_LOOKBACK,
+    CORRELATION_MIN_OVERLAP,
+)
+from .market_data import load_archived_bars
+from .profiling import profiled
+
+logger = logging.getLogger("tradingscreen.correlation")
+
+_lock = threading.Lock()
+# (market, timeframe, symbols, lookback) -> CorrelationAccumulator, least recent first
+_accumulators = OrderedDict()
+
+
+class CorrelationAccumulator:
+    """Pairwise return correlations over the last `lookback` bar times,
+    kept as running sums.
+
+    Sums are over the returns both symbols of a pair have, so symbols with
+    gaps or shorter history still pair up. New bars are added and bars
+    leaving the window subtracted with matrix products over just those
+    rows, never the whole window.
+    """
+
+    def __init__(self, symbols, lookback):
+        self.symbols = list(symbols)
+        self.lookback = lookback
+        n = len(self.symbols)
+        self.count = np.zeros((n, n))
+        self.sum = np.zeros((n, n))  # [i, j]: sum of i's returns where j has one
+        self.sum_sq = np.zeros((n, n))
+        self.sum_xy = np.zeros((n, n))
+        self.log_growth = np.zeros(n)
+        # Rows currently in the window, oldest first
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.returns = np.empty((0, n))
+
+    @property
+    def rows(self):
+        return len(self.timestamps)
+
+    def _apply(self, returns, sign):
+        valid = ~np.isnan(returns)
+        present = valid.astype(np.float64)
+        values = np.where(valid, returns, 0.0)
+        self.count += sign * (present.T @ present)
+        self.sum += sign * (values.T @ present)
+        self.sum_sq += sign * ((values * values).T @ present)
+        self.sum_xy += sign * (values.T @ values)
+        self.log_growth += sign * values.sum(axis=0)
+
+    def drop_last(self):
+        """Remove the newest row, e.g. because its bar was still forming"""
+        if self.rows:
+            self._apply(self.returns[-1:], -1)
+            self.timestamps = self.timestamps[:-1]
+            self.returns = self.returns[:-1]
+
+    def update(self, timestamps, returns):
+        """Add a (bars x symbols) block of log returns, NaN where missing,
+        then drop the rows that fell out of the lookback window
+        """
+        if len(timestamps) == 0:
+            return
+        self._apply(returns, 1)
+        self.timestamps = np.concatenate([self.timestamps, timestamps])
+        self.returns = np.concatenate([self.returns, returns])
+        excess = self.rows - self.lookback
+        if excess > 0:
+            self._apply(self.returns[:excess], -1)
+            self.timestamps = self.timestamps[excess:]
+            self.returns = self.returns[excess:]
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[-1]) if self.rows else None
+
+    def correlation(self):
+        n = self.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = n * self.sum_xy - self.sum * self.sum.T
+            variance_x = n * self.sum_sq - self.sum**2
+            variance_y = variance_x.T
+            matrix = covariance / np.sqrt(variance_x * variance_y)
+        matrix[n < CORRELATION_MIN_OVERLAP] = np.nan
+        return pd.DataFrame(
+            np.clip(matrix, -1, 1), index=self.symbols, columns=self.symbols
+        )
+
+    def relative_strength(self):
+        """Each symbol's return over the period relative to the basket average"""
+        growth = np.exp(self.log_growth)
+        strength = (growth / growth.mean() - 1) * 100
+        return (
+            pd.DataFrame(
+                {
+                    "symbol": self.symbols,
+                    "return_pct": (growth - 1) * 100,
+                    "relative_strength_pct": strength,
+                }
+            )
+            .sort_values("relative_strength_pct", ascending=False)
+            .reset_index(drop=True)
+        )
+
+
+def aligned_returns(bars_by_symbol, after=None, lookback=None):
+    """Log returns of every symbol on the union of their bar times.
+
+    Each return is against the symbol's own previous bar. Only bars after
+    `after` (ns) are included; with `lookback`, only the last `lookback`
+    bar times. Returns (timestamps, bars x symbols matrix with NaN gaps).
+    """
+    series = []
+    for bars in bars_by_symbol:
+        if bars is None or len(bars) < 2:
+            series.append((np.empty(0, dtype=np.int64), np.empty(0)))
+            continue
+        timestamps = bars.timestamps[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(np.asarray(bars.close, dtype=np.float64)))
+        if after is not None:
+            new = timestamps > after
+            timestamps, returns = timestamps[new], returns[new]
+        series.append((timestamps, returns))
+
+    union = np.unique(np.concatenate([timestamps for timestamps, _ in series]))
+    if lookback:
+        union = union[-lookback:]
+    matrix = np.full((len(union), len(series)), np.nan)
+    for column, (timestamps, returns) in enumerate(series):
+        rows = np.searchsorted(union, timestamps)
+        inside = rows < len(union)
+        inside[inside] = union[rows[inside]] == timestamps[inside]
+        matrix[rows[inside], column] = returns[inside]
+    return union, matrix
+
+
+def _basket_bars(market, symbol, timeframe):
+    try:
+        return load_archived_bars(market, symbol, timeframe)
+    except Exception as e:
+        logger.warning("Skipping %s from the basket: %s", symbol, e)
+        return None
+
+
+@profiled("correlation.basket")
+def basket_analysis(market, symbols, timeframe, lookback=CORRELATION_LOOKBACK):
+    """Correlation matrix and relative strength over the last `lookback` bar
+    times of a basket of symbols.
+
+    The accumulator of a basket is kept per process; asking again refreshes
+    stale symbols, folds in the new bars and drops those leaving the window.
+    Symbols without bars (failed or empty fetch) are left out. Returns
+    (correlation DataFrame, relative strength DataFrame, bar count, skipped
+    symbols); the frames are empty when fewer than two symbols have bars.
+    """
+    with ThreadPoolExecutor(max_workers=CORRELATION_FETCH_WORKERS) as pool:
+        loaded = list(
+            pool.map(lambda symbol: _basket_bars(market, symbol, timeframe), symbols)
+        )
+    skipped = [
+        symbol for symbol, bars in zip(symbols, loaded) if bars is None or len(bars) < 2
+    ]
+    basket = [bars for bars in loaded if bars is not None and len(bars) >= 2]
+    symbols = tuple(symbol for symbol in symbols if symbol not in skipped)
+    if len(symbols) < 2:
+        return pd.DataFrame(), pd.DataFrame(), 0, skipped
+
+    key = (market, timeframe, symbols, lookback)
+    with _lock:
+        accumulator = _accumulators.get(key)
+        if accumulator is None:
+            accumulator = _accumulators[key] = CorrelationAccumulator(
+                symbols, lookback
+            )
+            timestamps, returns = aligned_returns(basket, lookback=lookback)
+        else:
+            # The newest bar may have been forming; replace it with its final value
+            accumulator.drop_last()
+            timestamps, returns = aligned_returns(
+                basket, after=accumulator.last_timestamp, lookback=lookback
+            )
+        accumulator.update(timestamps, returns)
+        _accumulators.move_to_end(key)
+        while len(_accumulators) > CORRELATION_CACHE_SIZE:
+            _accumulators.popitem(last=False)
+        return (
+            accumulator.correlation(),
+            accumulator.relative_strength(),
+            accumulator.rows,
+            skipped,
+        )
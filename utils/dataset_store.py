@@ -0,0 +1,134 @@
+import itertools
+import os
+import shutil
+import threading
+import time
+import weakref
+
+from .bars import Bars
+from .config import DATASET_IDLE_SECONDS, DATASET_MMAP_DIR, DATASET_TTL
+
+# Process-wide registry shared by every Streamlit session:
+# (key, version) -> {"bars", "refs", "loaded_at", "released_at", "path"}
+# Reentrant: a handle's finalizer (_release) can run from a GC pass triggered
+# by an allocation made while this thread already holds the lock
+_lock = threading.RLock()
+_datasets = {}
+_latest = {}  # key -> newest version
+_versions = itertools.count(1)
+
+
+class DatasetHandle:
+    """Lightweight per-session reference to a shared dataset.
+
+    The reference is released when the handle is garbage collected, i.e.
+    when the session replaces it or the session state is dropped.
+    """
+
+    __slots__ = ("key", "version", "__weakref__")
+
+    def __init__(self, key, version):
+        self.key = key
+        self.version = version
+        weakref.finalize(self, _release, key, version)
+
+    @property
+    def bars(self):
+        return _datasets[(self.key, self.version)]["bars"]
+
+
+def dataset_key(symbol, exchange, interval, n_bars=2500):
+    return (symbol, exchange, str(interval), n_bars)
+
+
+def _release(key, version):
+    with _lock:
+        entry = _datasets.get((key, version))
+        if entry is not None:
+            entry["refs"] -= 1
+            if entry["refs"] == 0:
+                entry["released_at"] = time.monotonic()
+
+
+def _spill(version, bars):
+    """Move the arrays to memory-mapped files so the page cache backs them"""
+    path = os.path.join(DATASET_MMAP_DIR, f"{os.getpid()}-{version}")
+    bars.save(path)
+    return Bars.load(path), path
+
+
+def _evict(now):
+    """Drop unreferenced datasets that are idle or superseded (lock held)"""
+    for entry_key in list(_datasets):
+        entry = _datasets[entry_key]
+        if entry["refs"] > 0:
+            continue
+        key, version = entry_key
+        superseded = _latest.get(key) != version
+        if superseded or now - entry["released_at"] >= DATASET_IDLE_SECONDS:
+            del _datasets[entry_key]
+            if not superseded:
+                del _latest[key]
+            if entry["path"]:
+                shutil.rmtree(entry["path"], ignore_errors=True)
+
+
+def acquire(key, loader, refresh=False):
+    """Return a handle to the dataset for `key`, loading it if needed.
+
+    A dataset loaded less than DATASET_TTL seconds ago is shared; otherwise
+    (or with `refresh`) `loader` is called and must return Bars or None.
+    Older versions stay alive until their last handle is released.
+    """
+    now = time.monotonic()
+    with _lock:
+        _evict(now)
+        version = _latest.get(key)
+        if version is not None and not refresh:
+            entry = _datasets[(key, version)]
+            if now - entry["loaded_at"] < DATASET_TTL:
+                entry["refs"] += 1
+                return DatasetHandle(key, version)
+
+    bars = loader()
+    if bars is None or len(bars) == 0:
+        return None
+
+    version = next(_versions)
+    path = None
+    if DATASET_MMAP_DIR:
+        bars, path = _spill(version, bars)
+
+    with _lock:
+        _datasets[(key, version)] = {
+            "bars": bars,
+            "refs": 1,
+            "loaded_at": time.monotonic(),
+            "released_at": None,
+            "path": path,
+        }
+        _latest[key] = version
+        return DatasetHandle(key, version)
+
+
+def latest_bars(symbol):
+    """Most recently loaded Bars for `symbol` across intervals, or None"""
+    with _lock:
+        candidates = [
+            entry
+            for (key, version), entry in _datasets.items()
+            if key[0] == symbol and _latest.get(key) == version
+        ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda entry: entry["bars"].timestamps[-1])["bars"]
+
+
+def stats():
+    """Summary of the registry for diagnostics"""
+    with _lock:
+        return {
+            "datasets": len(_datasets),
+            "references": sum(entry["refs"] for entry in _datasets.values()),
+            "bytes": sum(entry["bars"].nbytes for entry in _datasets.values()),
+        }
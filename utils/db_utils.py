@@ -1,12 +1,63 @@
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
+import threading
 import pandas as pd
+from .config import DB_PATH, DB_TIMEOUT, INITIAL_BALANCE
+from .profiling import profiled
 
+_init_lock = threading.Lock()
+_initialized = False
 
+
+def get_connection():
+    """Open a connection that waits on locks instead of failing immediately"""
+    conn = sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT)
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_TIMEOUT * 1000)}")
+    return conn
+
+
+@contextmanager
+def write_transaction():
+    """Connection holding the database write lock until the block commits.
+
+    Reads made through it see no concurrent writes, and any exception rolls
+    back everything done in the block.
+    """
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _connection(conn=None):
+    """The caller's connection (caller commits) or a fresh one committed on exit"""
+    if conn is not None:
+        yield conn
+        return
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@profiled("db.init_db")
 def init_db():
-    conn = sqlite3.connect("trading.db")
+    conn = get_connection()
     c = conn.cursor()
 
+    # WAL lets readers proceed while another session writes
+    c.execute("PRAGMA journal_mode = WAL")
+
     # Users table
     c.execute(
         """CREATE TABLE IF NOT EXISTS users
@@ -44,14 +95,144 @@ def init_db():
                   market TEXT,
                   FOREIGN KEY (user_id) REFERENCES users(id))"""
     )
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_transactions_user_time
+                 ON transactions (user_id, timestamp)"""
+    )
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_transactions_user_symbol
+                 ON transactions (user_id, symbol, market, chart_timestamp)"""
+    )
+
+    # Working orders (limit / stop) waiting for the replay to reach them
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS orders
+                 (id INTEGER PRIMARY KEY,
+                  user_id INTEGER,
+                  symbol TEXT,
+                  market TEXT,
+                  side TEXT,
+                  order_type TEXT,
+                  quantity REAL,
+                  price REAL,
+                  status TEXT,
+                  created_at DATETIME,
+                  chart_timestamp DATETIME,
+                  filled_at DATETIME,
+                  fill_price REAL,
+                  fill_chart_timestamp DATETIME,
+                  FOREIGN KEY (user_id) REFERENCES users(id))"""
+    )
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_orders_open
+                 ON orders (user_id, symbol, market, status)"""
+    )
+
+    init_aggregates(c)
 
     conn.commit()
     conn.close()
 
 
-def init_user(user_id, initial_balance=10000):
+def ensure_db():
+    """Run init_db once per process instead of on every script rerun"""
+    global _initialized
+    with _init_lock:
+        if not _initialized:
+            init_db()
+            _initialized = True
+
+
+def init_aggregates(c):
+    """Create the materialized P&L tables and the trigger that maintains them"""
+    c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pnl_daily'"
+    )
+    needs_backfill = c.fetchone() is None
+
+    # Realized P&L, trade counts and turnover per user/symbol/day
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS pnl_daily
+                 (user_id INTEGER,
+                  symbol TEXT,
+                  market TEXT,
+                  day DATE,
+                  realized_pnl REAL,
+                  trade_count INTEGER,
+                  buy_count INTEGER,
+                  sell_count INTEGER,
+                  turnover REAL,
+                  PRIMARY KEY (user_id, symbol, market, day))"""
+    )
+
+    # Running totals per user (one row per user for leaderboards)
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS user_stats
+                 (user_id INTEGER PRIMARY KEY,
+                  realized_pnl REAL,
+                  trade_count INTEGER,
+                  turnover REAL,
+                  last_trade_at DATETIME)"""
+    )
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_user_stats_pnl
+                 ON user_stats (realized_pnl DESC)"""
+    )
+
+    # Every insert into transactions, from any code path, updates both tables
+    c.execute(
+        """CREATE TRIGGER IF NOT EXISTS trg_transactions_aggregates
+                 AFTER INSERT ON transactions
+                 BEGIN
+                     INSERT INTO pnl_daily
+                         (user_id, symbol, market, day, realized_pnl,
+                          trade_count, buy_count, sell_count, turnover)
+                     VALUES
+                         (NEW.user_id, NEW.symbol, NEW.market, date(NEW.timestamp),
+                          COALESCE(NEW.profit_loss, 0), 1,
+                          NEW.type = 'BUY', NEW.type = 'SELL', NEW.total_amount)
+                     ON CONFLICT (user_id, symbol, market, day) DO UPDATE SET
+                         realized_pnl = realized_pnl + excluded.realized_pnl,
+                         trade_count = trade_count + 1,
+                         buy_count = buy_count + excluded.buy_count,
+                         sell_count = sell_count + excluded.sell_count,
+                         turnover = turnover + excluded.turnover;
+
+                     INSERT INTO user_stats
+                         (user_id, realized_pnl, trade_count, turnover, last_trade_at)
+                     VALUES
+                         (NEW.user_id, COALESCE(NEW.profit_loss, 0), 1,
+                          NEW.total_amount, NEW.timestamp)
+                     ON CONFLICT (user_id) DO UPDATE SET
+                         realized_pnl = realized_pnl + excluded.realized_pnl,
+                         trade_count = trade_count + 1,
+                         turnover = turnover + excluded.turnover,
+                         last_trade_at = MAX(last_trade_at, excluded.last_trade_at);
+                 END"""
+    )
+
+    if needs_backfill:
+        c.execute(
+            """INSERT INTO pnl_daily
+                     SELECT user_id, symbol, market, date(timestamp),
+                            SUM(COALESCE(profit_loss, 0)), COUNT(*),
+                            SUM(type = 'BUY'), SUM(type = 'SELL'), SUM(total_amount)
+                     FROM transactions
+                     GROUP BY user_id, symbol, market, date(timestamp)"""
+        )
+        c.execute(
+            """INSERT OR REPLACE INTO user_stats
+                     SELECT user_id, SUM(COALESCE(profit_loss, 0)), COUNT(*),
+                            SUM(total_amount), MAX(timestamp)
+                     FROM transactions
+                     GROUP BY user_id"""
+        )
+
+
+@profiled("db.init_user")
+def init_user(user_id, initial_balance=INITIAL_BALANCE):
     """Initialize user with given balance if not exists"""
-    conn = sqlite3.connect("trading.db")
+    conn = get_connection()
     c = conn.cursor()
     
     c.execute("SELECT id FROM users WHERE id = ?", (user_id,))
@@ -64,23 +245,55 @@ def init_user(user_id, initial_balance=10000):
     conn.close()
 
 
-def get_user_balance(user_id):
-    conn = sqlite3.connect("trading.db")
+@profiled("db.get_or_create_user")
+def get_or_create_user(username, initial_balance=INITIAL_BALANCE):
+    """Return (id, balance) for `username`, creating the user if needed"""
+    conn = get_connection()
     c = conn.cursor()
-    c.execute("SELECT balance FROM users WHERE id = ?", (user_id,))
-    balance = c.fetchone()[0]
+    c.execute(
+        "INSERT OR IGNORE INTO users (username, balance) VALUES (?, ?)",
+        (username, initial_balance),
+    )
+    c.execute("SELECT id, balance FROM users WHERE username = ?", (username,))
+    user = c.fetchone()
+    conn.commit()
     conn.close()
-    return balance
+    return user
 
 
+@profiled("db.get_user_balance")
+def get_user_balance(user_id, conn=None):
+    with _connection(conn) as conn:
+        c = conn.cursor()
+        c.execute("SELECT balance FROM users WHERE id = ?", (user_id,))
+        return c.fetchone()[0]
+
+
+@profiled("db.update_user_balance")
 def update_user_balance(user_id, new_balance):
-    conn = sqlite3.connect("trading.db")
+    conn = get_connection()
     c = conn.cursor()
     c.execute("UPDATE users SET balance = ? WHERE id = ?", (new_balance, user_id))
     conn.commit()
     conn.close()
 
 
+@profiled("db.adjust_user_balance")
+def adjust_user_balance(user_id, amount, conn=None):
+    """Add `amount` to the stored balance and return the new balance.
+
+    The increment happens in SQL, so concurrent writers in other processes
+    never overwrite each other. With `conn` the update joins the caller's
+    transaction and the caller commits.
+    """
+    with _connection(conn) as conn:
+        return conn.execute(
+            "UPDATE users SET balance = balance + ? WHERE id = ? RETURNING balance",
+            (amount, user_id),
+        ).fetchone()[0]
+
+
+@profiled("db.add_transaction")
 def add_transaction(
     user_id,
     symbol,
@@ -91,55 +304,276 @@ def add_transaction(
     profit_loss,
     market,
     chart_timestamp,
+    conn=None,
 ):
-    conn = sqlite3.connect("trading.db")
-    c = conn.cursor()
     timestamp = datetime.now()
 
     # Pandas Timestamp'i datetime'a çevir
     if isinstance(chart_timestamp, pd.Timestamp):
         chart_timestamp = chart_timestamp.to_pydatetime()
 
+    with _connection(conn) as conn:
+        conn.execute(
+            """INSERT INTO transactions 
+                     (user_id, symbol, type, quantity, price, total_amount, profit_loss, timestamp, chart_timestamp, market)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                user_id,
+                symbol,
+                type,
+                quantity,
+                price,
+                total_amount,
+                profit_loss,
+                timestamp,
+                chart_timestamp,
+                market,
+            ),
+        )
+
+
+@profiled("db.update_asset")
+def update_asset(user_id, symbol, quantity, avg_price, total_cost, market, conn=None):
+    with _connection(conn) as conn:
+        c = conn.cursor()
+
+        # Önce eski kaydı sil
+        c.execute(
+            """DELETE FROM assets 
+                     WHERE user_id = ? AND symbol = ? AND market = ?""",
+            (user_id, symbol, market),
+        )
+
+        # Eğer quantity 0'dan büyükse yeni kaydı ekle
+        if quantity > 0:
+            c.execute(
+                """INSERT INTO assets 
+                         (user_id, symbol, quantity, avg_price, total_cost, market)
+                         VALUES (?, ?, ?, ?, ?, ?)""",
+                (user_id, symbol, quantity, avg_price, total_cost, market),
+            )
+
+
+@profiled("db.get_positions")
+def get_positions(user_id):
+    """All open positions of a user in one query"""
+    conn = get_connection()
+    positions = pd.read_sql_query(
+        """SELECT symbol, quantity, avg_price, total_cost, market
+           FROM assets
+           WHERE user_id = ? AND quantity > 0""",
+        conn,
+        params=(user_id,),
+    )
+    conn.close()
+    return positions
+
+
+@profiled("db.get_recent_transactions")
+def get_recent_transactions(user_id, limit=10):
+    conn = get_connection()
+    transactions = pd.read_sql_query(
+        """SELECT symbol, type, quantity, price, total_amount,
+                  profit_loss, timestamp, chart_timestamp, market
+           FROM transactions
+           WHERE user_id = ?
+           ORDER BY timestamp DESC
+           LIMIT ?""",
+        conn,
+        params=(user_id, limit),
+    )
+    conn.close()
+    return transactions
+
+
+@profiled("db.get_user_stats")
+def get_user_stats(user_id):
+    """Realized P&L, trade count and turnover from the materialized totals"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        """SELECT realized_pnl, trade_count, turnover, last_trade_at
+           FROM user_stats WHERE user_id = ?""",
+        (user_id,),
+    )
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        row = (0.0, 0, 0.0, None)
+    return dict(zip(("realized_pnl", "trade_count", "turnover", "last_trade_at"), row))
+
+
+@profiled("db.get_daily_pnl")
+def get_daily_pnl(user_id, limit=30):
+    """Realized P&L per day (summed over symbols), newest first"""
+    conn = get_connection()
+    daily = pd.read_sql_query(
+        """SELECT day, SUM(realized_pnl) AS realized_pnl,
+                  SUM(trade_count) AS trade_count, SUM(turnover) AS turnover
+           FROM pnl_daily
+           WHERE user_id = ?
+           GROUP BY day
+           ORDER BY day DESC
+           LIMIT ?""",
+        conn,
+        params=(user_id, limit),
+    )
+    conn.close()
+    return daily
+
+
+@profiled("db.get_leaderboard")
+def get_leaderboard(limit=10):
+    conn = get_connection()
+    leaderboard = pd.read_sql_query(
+        """SELECT u.username, s.realized_pnl, s.trade_count, s.turnover
+           FROM user_stats s JOIN users u ON u.id = s.user_id
+           ORDER BY s.realized_pnl DESC
+           LIMIT ?""",
+        conn,
+        params=(limit,),
+    )
+    conn.close()
+    return leaderboard
+
+
+@profiled("db.get_asset")
+def get_asset(user_id, symbol, market, conn=None):
+    """(quantity, avg_price, total_cost) of a position, or None"""
+    with _connection(conn) as conn:
+        c = conn.cursor()
+        c.execute(
+            """SELECT quantity, avg_price, total_cost FROM assets
+               WHERE user_id = ? AND symbol = ? AND market = ?""",
+            (user_id, symbol, market),
+        )
+        return c.fetchone()
+
+
+@profiled("db.get_chart_trades")
+def get_chart_trades(user_id, symbol, market):
+    """Trades of a symbol as chart markers, ordered by chart time"""
+    conn = get_connection()
+    transactions = pd.read_sql_query(
+        """SELECT type, chart_timestamp, price
+           FROM transactions
+           WHERE user_id = ? AND symbol = ? AND market = ?
+           ORDER BY chart_timestamp""",
+        conn,
+        params=(user_id, symbol, market),
+    )
+    conn.close()
+    return [
+        {
+            "type": row.type,
+            "timestamp": pd.to_datetime(row.chart_timestamp),
+            "price": row.price,
+        }
+        for row in transactions.itertuples(index=False)
+    ]
+
+
+@profiled("db.add_order")
+def add_order(
+    user_id, symbol, market, side, order_type, quantity, price, chart_timestamp
+):
+    conn = get_connection()
+    c = conn.cursor()
+    if isinstance(chart_timestamp, pd.Timestamp):
+        chart_timestamp = chart_timestamp.to_pydatetime()
     c.execute(
-        """INSERT INTO transactions 
-                 (user_id, symbol, type, quantity, price, total_amount, profit_loss, timestamp, chart_timestamp, market)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        """INSERT INTO orders
+                 (user_id, symbol, market, side, order_type, quantity, price,
+                  status, created_at, chart_timestamp)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, 'OPEN', ?, ?)""",
         (
             user_id,
             symbol,
-            type,
+            market,
+            side,
+            order_type,
             quantity,
             price,
-            total_amount,
-            profit_loss,
-            timestamp,
+            datetime.now(),
             chart_timestamp,
-            market,
         ),
     )
+    order_id = c.lastrowid
     conn.commit()
     conn.close()
+    return order_id
 
 
-def update_asset(user_id, symbol, quantity, avg_price, total_cost, market):
-    conn = sqlite3.connect("trading.db")
-    c = conn.cursor()
+@profiled("db.get_open_orders")
+def get_open_orders(user_id, symbol=None, market=None):
+    """Working orders of a user, optionally for one symbol"""
+    query = """SELECT id, symbol, market, side, order_type, quantity, price,
+                      chart_timestamp
+               FROM orders
+               WHERE user_id = ? AND status = 'OPEN'"""
+    params = [user_id]
+    if symbol is not None:
+        query += " AND symbol = ? AND market = ?"
+        params += [symbol, market]
+    conn = get_connection()
+    orders = pd.read_sql_query(
+        query + " ORDER BY id", conn, params=params, parse_dates=["chart_timestamp"]
+    )
+    conn.close()
+    return orders
 
-    # Önce eski kaydı sil
-    c.execute(
-        """DELETE FROM assets 
-                 WHERE user_id = ? AND symbol = ? AND market = ?""",
-        (user_id, symbol, market),
+
+@profiled("db.cancel_order")
+def cancel_order(user_id, order_id):
+    conn = get_connection()
+    conn.execute(
+        """UPDATE orders SET status = 'CANCELLED'
+           WHERE id = ? AND user_id = ? AND status = 'OPEN'""",
+        (order_id, user_id),
     )
+    conn.commit()
+    conn.close()
 
-    # Eğer quantity 0'dan büyükse yeni kaydı ekle
-    if quantity > 0:
-        c.execute(
-            """INSERT INTO assets 
-                     (user_id, symbol, quantity, avg_price, total_cost, market)
-                     VALUES (?, ?, ?, ?, ?, ?)""",
-            (user_id, symbol, quantity, avg_price, total_cost, market),
+
+@profiled("db.claim_order")
+def claim_order(order_id, status, fill_price, fill_chart_timestamp, conn=None):
+    """Close an OPEN order; False if another process already closed it.
+
+    Inside the fill's transaction this makes each order fill at most once.
+    """
+    if isinstance(fill_chart_timestamp, pd.Timestamp):
+        fill_chart_timestamp = fill_chart_timestamp.to_pydatetime()
+    with _connection(conn) as conn:
+        cursor = conn.execute(
+            """UPDATE orders
+               SET status = ?, fill_price = ?, fill_chart_timestamp = ?, filled_at = ?
+               WHERE id = ? AND status = 'OPEN'""",
+            (status, fill_price, fill_chart_timestamp, datetime.now(), order_id),
         )
+        return cursor.rowcount == 1
+
 
+@profiled("db.close_orders")
+def close_orders(updates):
+    """Apply (status, fill_price, fill_chart_timestamp, order_id) rows at once"""
+    if not updates:
+        return
+    now = datetime.now()
+    conn = get_connection()
+    conn.executemany(
+        """UPDATE orders
+           SET status = ?, fill_price = ?, fill_chart_timestamp = ?, filled_at = ?
+           WHERE id = ? AND status = 'OPEN'""",
+        [
+            (
+                status,
+                fill_price,
+                ts.to_pydatetime() if isinstance(ts, pd.Timestamp) else ts,
+                now,
+                order_id,
+            )
+            for status, fill_price, ts, order_id in updates
+        ],
+    )
     conn.commit()
     conn.close()
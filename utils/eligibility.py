@@ -0,0 +1,226 @@
+import logging
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .archive import read_range
+from .config import (
+    ELIGIBILITY_IDLE,
+    ELIGIBILITY_MAX_IDLE_DAYS,
+    ELIGIBILITY_MIN_BARS,
+    ELIGIBILITY_MIN_TURNOVER,
+    ELIGIBILITY_REFRESH,
+    RANDOM_SYMBOL_ATTEMPTS,
+    TIMEFRAME_INTERVALS,
+)
+from .market_data import get_full_symbol
+
+logger = logging.getLogger("tradingscreen.eligibility")
+
+_lock = threading.Lock()
+_indexes = {}  # (market, timeframe) -> EligibilityIndex
+_worker = None  # One crawler thread for every index, running while any is in use
+
+RECENT_BARS = 100  # Bars the activity and liquidity checks look at
+POLL_SECONDS = 5  # How often the crawler looks for due or unused indexes
+
+
+class EligibilityIndex:
+    """Symbols of one market/timeframe known to have replayable history.
+
+    Kept as a list plus a position map, so sampling, adding and removing
+    are all O(1). Symbols are checked against the local archive only (never
+    the upstream), by the shared crawler and whenever a symbol is loaded.
+    """
+
+    def __init__(self, market, timeframe):
+        self.market = market
+        self.timeframe = timeframe
+        self.symbols = []
+        self.positions = {}
+        self.candidates = []  # The market's symbol list, re-checked each pass
+        self.checked = 0
+        self.total = 0
+        self.used = time.monotonic()
+        self.refreshed = None  # monotonic time of the last finished pass
+        self.retired = False
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def building(self):
+        return self.checked < self.total
+
+    def add(self, symbol):
+        with self.lock:
+            if symbol not in self.positions:
+                self.positions[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+
+    def discard(self, symbol):
+        """Remove in O(1) by moving the last symbol into the hole"""
+        with self.lock:
+            position = self.positions.pop(symbol, None)
+            if position is None:
+                return
+            last = self.symbols.pop()
+            if last != symbol:
+                self.symbols[position] = last
+                self.positions[last] = position
+
+    def sample(self, exclude=None):
+        """A random eligible symbol other than `exclude`, or None"""
+        with self.lock:
+            candidates = len(self.symbols) - (exclude in self.positions)
+            if candidates <= 0:
+                return None
+            while True:
+                symbol = self.symbols[random.randrange(len(self.symbols))]
+                if symbol != exclude:
+                    return symbol
+
+    def check(self, symbol):
+        """Re-check one symbol, e.g. right after it was loaded"""
+        try:
+            eligible = is_eligible(self.market, symbol, self.timeframe)
+        except Exception as e:
+            logger.warning("Eligibility check failed for %s: %s", symbol, e)
+            eligible = False
+        if eligible:
+            self.add(symbol)
+        else:
+            self.discard(symbol)
+        return eligible
+
+    def refresh(self):
+        """Re-check every candidate (runs in the crawler thread)"""
+        symbols = list(self.candidates)
+        self.checked, self.total = 0, len(symbols)
+        # Random order, so the pool is varied while the first pass is running
+        for symbol in random.sample(symbols, len(symbols)):
+            if self.retired:
+                return
+            self.check(symbol)
+            self.checked += 1
+        self.refreshed = time.monotonic()
+
+
+def _archived_bars(market, symbol, timeframe):
+    return read_range(get_full_symbol(market, symbol), timeframe)
+
+
+def _idle(bars, timeframe):
+    max_idle = max(
+        ELIGIBILITY_MAX_IDLE_DAYS * 86400, 2 * TIMEFRAME_INTERVALS.get(timeframe, 0)
+    )
+    age = pd.Timestamp.now().value - int(bars.timestamps[-1])
+    return age > max_idle * 10**9
+
+
+def is_eligible(market, symbol, timeframe):
+    """Enough archived bars, recent trading and (optionally) enough turnover"""
+    bars = _archived_bars(market, symbol, timeframe)
+    min_bars = ELIGIBILITY_MIN_BARS.get(timeframe, 300)
+    if bars is None or len(bars) < min_bars or _idle(bars, timeframe):
+        return False
+
+    recent = bars.view(None, -RECENT_BARS)
+    volume = np.asarray(recent.volume, dtype=np.float64)
+    if not np.nansum(volume) > 0:
+        return False
+
+    min_turnover = ELIGIBILITY_MIN_TURNOVER.get(market)
+    if min_turnover is not None:
+        close = np.asarray(recent.close, dtype=np.float64)
+        if not np.nanmedian(close * volume) >= min_turnover:
+            return False
+    return True
+
+
+def _crawl():
+    """Refresh due indexes; drop unused ones and exit once none is left"""
+    global _worker
+    while True:
+        now = time.monotonic()
+        with _lock:
+            for key, index in list(_indexes.items()):
+                if now - index.used > ELIGIBILITY_IDLE:
+                    index.retired = True
+                    del _indexes[key]
+            if not _indexes:
+                _worker = None
+                return
+            due = [
+                index
+                for index in _indexes.values()
+                if index.refreshed is None
+                or now - index.refreshed >= ELIGIBILITY_REFRESH
+            ]
+        for index in due:
+            index.refresh()
+        time.sleep(POLL_SECONDS)
+
+
+def eligibility_index(market, timeframe, symbols):
+    """The index for market/timeframe, marking it in use.
+
+    Starts the shared crawler if it is not running; an index nobody asks for
+    within ELIGIBILITY_IDLE seconds is dropped.
+    """
+    global _worker
+    with _lock:
+        index = _indexes.get((market, timeframe))
+        if index is None:
+            index = _indexes[(market, timeframe)] = EligibilityIndex(market, timeframe)
+            index.total = len(symbols)
+        index.used = time.monotonic()
+        if len(symbols) != len(index.candidates):
+            index.candidates = list(symbols)
+        if _worker is None:
+            _worker = threading.Thread(
+                target=_crawl, name="eligibility-crawler", daemon=True
+            )
+            _worker.start()
+    return index
+
+
+def pick_random_symbol(
+    index, symbols, load, exclude=None, attempts=RANDOM_SYMBOL_ATTEMPTS
+):
+    """A random replayable symbol and its loaded data, or (None, None).
+
+    Drawn from the eligible pool; while the pool is empty (e.g. nothing is
+    archived yet) random symbols are tried instead. Each pick is loaded with
+    `load(symbol)`, which archives it, and taken once it passes the
+    eligibility check. At most `attempts` symbols are loaded; if none passes,
+    the first one that loaded at all is returned.
+    """
+    others = [symbol for symbol in symbols if symbol != exclude]
+    random.shuffle(others)
+    tried = set()
+    fallback = (None, None)
+    for _ in range(attempts):
+        symbol = index.sample(exclude)
+        if symbol is None or symbol in tried:
+            symbol = next((s for s in others if s not in tried), None)
+        if symbol is None:
+            break
+        tried.add(symbol)
+        try:
+            data = load(symbol)
+        except Exception as e:
+            logger.warning("Random symbol %s failed to load: %s", symbol, e)
+            data = None
+        if data is None:
+            index.discard(symbol)
+            continue
+        if index.check(symbol):
+            return symbol, data
+        if fallback[0] is None:
+            fallback = (symbol, data)
+    return fallback
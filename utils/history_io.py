@@ -0,0 +1,141 @@
+from .config import HISTORY_CHUNK_ROWS
+from .db_utils import get_connection
+from .profiling import profiled
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export / import is optional
+    pa = pq = None
+
+# Table -> ((column, arrow type), ...); user_id and row ids are not exported
+TABLES = {
+    "transactions": (
+        ("symbol", "string"),
+        ("type", "string"),
+        ("quantity", "float64"),
+        ("price", "float64"),
+        ("total_amount", "float64"),
+        ("profit_loss", "float64"),
+        ("timestamp", "timestamp"),
+        ("chart_timestamp", "timestamp"),
+        ("market", "string"),
+    ),
+    "assets": (
+        ("symbol", "string"),
+        ("quantity", "float64"),
+        ("avg_price", "float64"),
+        ("total_cost", "float64"),
+        ("market", "string"),
+    ),
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet export and import")
+
+
+def _schema(table):
+    types = {
+        "string": pa.string(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+
+
+def _to_batch(table, schema, rows):
+    """fetchmany rows -> RecordBatch; SQLite datetime text is parsed by Arrow"""
+    columns = []
+    for (name, kind), values in zip(TABLES[table], zip(*rows)):
+        if kind == "timestamp":
+            columns.append(pa.array(values, pa.string()).cast(schema.field(name).type))
+        else:
+            columns.append(pa.array(values, schema.field(name).type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+@profiled("history.export")
+def export_table(user_id, table, destination, chunk_rows=HISTORY_CHUNK_ROWS):
+    """Stream a user's rows of `table` to a Parquet file (path or file object).
+
+    Rows are read with fetchmany and written one row group per chunk, so
+    memory stays bounded by `chunk_rows`. Returns the number of rows written.
+    """
+    _require_pyarrow()
+    schema = _schema(table)
+    columns = ", ".join(name for name, _ in TABLES[table])
+    conn = get_connection()
+    written = 0
+    try:
+        cursor = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE user_id = ? ORDER BY id",
+            (user_id,),
+        )
+        with pq.ParquetWriter(destination, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                writer.write_batch(_to_batch(table, schema, rows))
+                written += len(rows)
+    finally:
+        conn.close()
+    return written
+
+
+@profiled("history.import")
+def import_table(user_id, table, source, chunk_rows=HISTORY_CHUNK_ROWS):
+    """Bulk-insert a Parquet file written by `export_table` for `user_id`.
+
+    All batches go through executemany inside one transaction, so the import
+    is all-or-nothing. Importing positions replaces the user's current ones;
+    transactions are appended (and update the P&L aggregates via trigger).
+    Balances are left unchanged, so this is an administrative tool (migrations,
+    restores) and is not offered to users in the app. Returns the number of
+    rows imported.
+    """
+    _require_pyarrow()
+    schema = _schema(table)
+    names = [name for name, _ in TABLES[table]]
+    statement = (
+        f"INSERT INTO {table} (user_id, {', '.join(names)}) "
+        f"VALUES (?, {', '.join('?' * len(names))})"
+    )
+    parquet = pq.ParquetFile(source)
+    conn = get_connection()
+    imported = 0
+    try:
+        with conn:
+            if table == "assets":
+                conn.execute("DELETE FROM assets WHERE user_id = ?", (user_id,))
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=names):
+                columns = []
+                for name, kind in TABLES[table]:
+                    values = batch.column(name).cast(schema.field(name).type)
+                    values = values.to_pylist()
+                    if kind == "timestamp":
+                        # Same text form as natively written rows, so they
+                        # sort and compare alike
+                        values = [
+                            value.isoformat(" ") if value is not None else None
+                            for value in values
+                        ]
+                    columns.append(values)
+                conn.executemany(
+                    statement,
+                    ((user_id, *row) for row in zip(*columns)),
+                )
+                imported += batch.num_rows
+    finally:
+        conn.close()
+    return imported
+
+
+def export_history(user_id, trades_destination, positions_destination):
+    """Export a user's transactions and positions; returns the row counts"""
+    return (
+        export_table(user_id, "transactions", trades_destination),
+        export_table(user_id, "assets", positions_destination),
+    )
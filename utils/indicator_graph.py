@@ -0,0 +1,298 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from .bars import COLUMNS
+from .profiling import timed
+
+# kind -> (compute, inputs). Node ids are column names ("close") or tuples
+# (kind, *params) whose params may themselves be node ids, e.g.
+# ("macd", 12, 26) -> ("ema", "close", 12), ("ema", "close", 26).
+NODES = {}
+
+# Graphs of datasets still in use, so a newer version of the same bars only
+# computes the rows that changed. Weak, so evicted datasets are not kept alive.
+_recent_lock = threading.Lock()
+_recent = weakref.WeakValueDictionary()  # (symbol, bar spacing) -> IndicatorGraph
+
+# Nodes whose values are row positions, which shift with the window
+POSITIONAL = {"session_start"}
+
+DAY_NS = 86_400 * 10**9
+
+
+def node(kind, inputs=lambda *params: ()):
+    """Register `compute(arrays, *params, previous, start)` as a node kind.
+
+    `arrays` are the full input arrays; `compute` returns values for rows
+    [start:]. With start > 0, `previous` holds this node's values for an
+    earlier version of the bars whose first `start` rows are unchanged.
+    """
+
+    def decorator(compute):
+        NODES[kind] = (compute, inputs)
+        return compute
+
+    return decorator
+
+
+def _tail_window(values, start, lookback):
+    """Slice that covers rows [start:] plus `lookback` rows of context"""
+    first = max(0, start - lookback)
+    return values[first:], start - first
+
+
+def _ewm(values, previous, start, **params):
+    """Recursive (adjust=False) EWM continued from the previous last value"""
+    if start == 0:
+        return pd.Series(values).ewm(adjust=False, **params).mean().to_numpy()
+    seeded = np.concatenate([previous[start - 1 : start], values[start:]])
+    return pd.Series(seeded).ewm(adjust=False, **params).mean().to_numpy()[1:]
+
+
+def _rolling(method, values, period, start):
+    window, skip = _tail_window(values, start, period - 1)
+    rolling = pd.Series(window).rolling(window=period)
+    return getattr(rolling, method)().to_numpy()[skip:]
+
+
+@node("sma", inputs=lambda source, period: [source])
+def sma(arrays, source, period, previous, start):
+    return _rolling("mean", arrays[0], period, start)
+
+
+@node("ema", inputs=lambda source, period: [source])
+def ema(arrays, source, period, previous, start):
+    return _ewm(arrays[0], previous, start, span=period)
+
+
+@node("rma", inputs=lambda source, period: [source])
+def rma(arrays, source, period, previous, start):
+    """Wilder's moving average (ATR, RSI)"""
+    return _ewm(arrays[0], previous, start, alpha=1 / period)
+
+
+@node("rolling_max", inputs=lambda source, period: [source])
+def rolling_max(arrays, source, period, previous, start):
+    return _rolling("max", arrays[0], period, start)
+
+
+@node("rolling_min", inputs=lambda source, period: [source])
+def rolling_min(arrays, source, period, previous, start):
+    return _rolling("min", arrays[0], period, start)
+
+
+@node("true_range", inputs=lambda: ["high", "low", "close"])
+def true_range(arrays, previous, start):
+    high, low, close = (_tail_window(values, start, 1)[0] for values in arrays)
+    skip = 1 if start > 0 else 0
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    ranges = np.fmax(
+        high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    )
+    return ranges[skip:]
+
+
+@node("atr", inputs=lambda period: [("rma", ("true_range",), period)])
+def atr(arrays, period, previous, start):
+    return arrays[0][start:]
+
+
+@node("change", inputs=lambda source: [source])
+def change(arrays, source, previous, start):
+    window, skip = _tail_window(arrays[0], start, 1)
+    return np.concatenate([[np.nan], np.diff(window)])[skip:]
+
+
+@node("gain", inputs=lambda source: [("change", source)])
+def gain(arrays, source, previous, start):
+    return np.clip(arrays[0][start:], 0, None)
+
+
+@node("loss", inputs=lambda source: [("change", source)])
+def loss(arrays, source, previous, start):
+    return np.clip(-arrays[0][start:], 0, None)
+
+
+@node(
+    "rsi",
+    inputs=lambda period: [
+        ("rma", ("gain", "close"), period),
+        ("rma", ("loss", "close"), period),
+    ],
+)
+def rsi(arrays, period, previous, start):
+    gains, losses = (values[start:] for values in arrays)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + gains / losses)
+
+
+@node("macd", inputs=lambda fast, slow: [("ema", "close", fast), ("ema", "close", slow)])
+def macd(arrays, fast, slow, previous, start):
+    return arrays[0][start:] - arrays[1][start:]
+
+
+@node("macd_signal", inputs=lambda fast, slow, signal: [("macd", fast, slow)])
+def macd_signal(arrays, fast, slow, signal, previous, start):
+    return _ewm(arrays[0], previous, start, span=signal)
+
+
+@node("log_return", inputs=lambda source: [source])
+def log_return(arrays, source, previous, start):
+    window, skip = _tail_window(arrays[0], start, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.concatenate([[np.nan], np.diff(np.log(window))])[skip:]
+
+
+@node("rolling_std", inputs=lambda source, period: [source])
+def rolling_std(arrays, source, period, previous, start):
+    return _rolling("std", arrays[0], period, start)
+
+
+@node("rolling_rank", inputs=lambda source, period: [source])
+def rolling_rank(arrays, source, period, previous, start):
+    """Percentile (0-1] of each value within its trailing window"""
+    window, skip = _tail_window(arrays[0], start, period - 1)
+    return pd.Series(window).rolling(period).rank(pct=True).to_numpy()[skip:]
+
+
+@node("session_start", inputs=lambda: ["timestamps"])
+def session_start(arrays, previous, start):
+    """Position of the first bar of each bar's calendar day"""
+    days = arrays[0] // DAY_NS
+    positions = np.arange(len(days))
+    first = np.ones(len(days), dtype=bool)
+    first[1:] = days[1:] != days[:-1]
+    starts = np.maximum.accumulate(np.where(first, positions, 0))
+    return starts[start:].astype(np.float64)
+
+
+@node("prev_session_close", inputs=lambda: [("session_start",), "close"])
+def prev_session_close(arrays, previous, start):
+    starts, close = arrays[0][start:].astype(np.int64), arrays[1]
+    return np.where(starts > 0, close[np.maximum(starts - 1, 0)], np.nan)
+
+
+@node("typical_price", inputs=lambda: ["high", "low", "close"])
+def typical_price(arrays, previous, start):
+    high, low, close = (values[start:] for values in arrays)
+    return (high + low + close) / 3
+
+
+@node(
+    "session_vwap",
+    inputs=lambda: [("typical_price",), "volume", ("session_start",)],
+)
+def session_vwap(arrays, previous, start):
+    """Volume-weighted average price since the start of the bar's day"""
+    price, volume, starts = arrays
+    starts = starts.astype(np.int64)
+    # Prefix sums make every session window an O(1) difference
+    value = np.concatenate([[0.0], np.cumsum(np.nan_to_num(price * volume))])
+    traded = np.concatenate([[0.0], np.cumsum(np.nan_to_num(volume))])
+    positions = np.arange(start, len(price))
+    session = starts[start:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (value[positions + 1] - value[session]) / (
+            traded[positions + 1] - traded[session]
+        )
+
+
+class IndicatorGraph:
+    """Memoized indicator nodes over one immutable set of bars.
+
+    Each node is computed at most once and shared by every indicator that
+    depends on it. Built from an earlier version of the same bars (e.g. the
+    previous fetch of a sliding window), nodes reuse the rows both versions
+    agree on and only compute the rest. Reused rows keep the values computed
+    with the earlier version's history.
+    """
+
+    def __init__(self, bars, previous=None):
+        self.bars = bars
+        self.values = {}
+        self.lock = threading.RLock()
+        self.previous = {}
+        self.start = 0
+        if previous is not None:
+            offset, self.start = _overlap(previous.bars, bars)
+            if self.start > 0:
+                # Only node arrays (never the old Bars) are carried over
+                self.previous = {
+                    node_id: values[offset:]
+                    for node_id, values in previous.values.items()
+                    if not isinstance(node_id, str) and node_id[0] not in POSITIONAL
+                }
+
+    def get(self, node_id):
+        """Values of `node_id` for every bar (read-only float64 array)"""
+        with self.lock:
+            values = self.values.get(node_id)
+            if values is not None:
+                return values
+
+            if node_id == "timestamps":
+                values = np.asarray(self.bars.timestamps, dtype=np.int64)
+            elif isinstance(node_id, str):
+                values = np.asarray(getattr(self.bars, node_id), dtype=np.float64)
+            else:
+                kind, *params = node_id
+                compute, inputs = NODES[kind]
+                arrays = [self.get(input_id) for input_id in inputs(*params)]
+                previous = self.previous.pop(node_id, None)
+                start = self.start if previous is not None else 0
+                with timed(f"indicator_graph.{kind}"):
+                    tail = compute(arrays, *params, previous=previous, start=start)
+                values = np.concatenate([previous[:start], tail]) if start else tail
+            values.flags.writeable = False
+            self.values[node_id] = values
+            return values
+
+
+def _overlap(old, new):
+    """(offset, rows): new[:rows] equals old[offset:offset + rows].
+
+    `new` may start later than `old` (a sliding window of the latest bars).
+    The last old bar may still have been forming, so it is never reused.
+    """
+    if len(old) < 2 or len(new) == 0:
+        return 0, 0
+    offset = int(np.searchsorted(old.timestamps, new.timestamps[0]))
+    if offset >= len(old) - 1 or old.timestamps[offset] != new.timestamps[0]:
+        return 0, 0
+    rows = min(len(old) - 1 - offset, len(new))
+    # Same bars at both ends of the overlap, and the same prices at its end
+    last = offset + rows - 1
+    if old.timestamps[last] != new.timestamps[rows - 1]:
+        return 0, 0
+    for column in COLUMNS:
+        if getattr(old, column)[last] != getattr(new, column)[rows - 1]:
+            return 0, 0
+    return offset, rows
+
+
+def _spacing(timestamps):
+    """Smallest gap between the first bars, to tell intervals apart"""
+    head = np.asarray(timestamps[:64], dtype=np.int64)
+    return int(np.diff(head).min()) if len(head) > 1 else 0
+
+
+def graph_for(bars):
+    """The shared IndicatorGraph of the dataset `bars` belongs to"""
+    base = bars.base
+    if base._graph is None:
+        key = (base.symbol, _spacing(base.timestamps))
+        with _recent_lock:
+            if base._graph is None:
+                previous = _recent.get(key)
+                base._graph = IndicatorGraph(base, previous)
+                _recent[key] = base._graph
+    return base._graph
+
+
+def node_values(bars, node_id):
+    """Values of `node_id` aligned with `bars` (which may be a view)"""
+    values = graph_for(bars).get(node_id)
+    return values[bars._start : bars._start + len(bars)]
@@ -1,33 +1,82 @@
 from tradingview_screener import get_all_symbols
 from tvDatafeed import TvDatafeed
-from .config import EXCHANGE_MAPPINGS, SYMBOL_PREFIXES
-from datetime import datetime, time
-import pandas as pd
+from .archive import append_bars, is_stale, read_range
+from .bars import Bars
+from .cleaning import clean_bars
+from .config import EXCHANGE_MAPPINGS, MARKET_HOURS, SYMBOL_PREFIXES, UPSTREAM_LIMITS
+from .dataset_store import acquire, dataset_key
+from .intervals import get_interval
+from .profiling import profiled, register_metrics_source
+from .scheduler import RequestScheduler, SingleFlight
+import logging
+
+logger = logging.getLogger("tradingscreen.market_data")
 
 tv = TvDatafeed()
 
+EXCHANGE_MARKETS = {exchange: market for market, exchange in EXCHANGE_MAPPINGS.items()}
+
+# One scheduler per upstream: rate limits, coalescing, retries, circuit breaking
+schedulers = {
+    name: RequestScheduler(name, **limits) for name, limits in UPSTREAM_LIMITS.items()
+}
+
+
+def scheduler_metrics():
+    """Prometheus lines for queue depth, in-flight calls, errors and latency"""
+    lines = []
+    for name, scheduler in schedulers.items():
+        metrics = scheduler.snapshot()
+        labels = f'upstream="{name}"'
+        lines += [
+            f"tradingscreen_upstream_queue_depth{{{labels}}} {metrics['queued']}",
+            f"tradingscreen_upstream_inflight{{{labels}}} {metrics['inflight']}",
+            f"tradingscreen_upstream_requests_total{{{labels}}} {metrics['requests']}",
+            f"tradingscreen_upstream_coalesced_total{{{labels}}} {metrics['coalesced']}",
+            f"tradingscreen_upstream_retries_total{{{labels}}} {metrics['retries']}",
+            f"tradingscreen_upstream_failures_total{{{labels}}} {metrics['failures']}",
+            f"tradingscreen_upstream_rejected_total{{{labels}}} {metrics['rejected']}",
+            f"tradingscreen_upstream_latency_seconds_sum{{{labels}}} {metrics['latency_total']}",
+            f"tradingscreen_upstream_latency_seconds_max{{{labels}}} {metrics['latency_max']}",
+            f"tradingscreen_upstream_circuit_open{{{labels}}} "
+            f"{int(metrics['circuit'] == 'open')}",
+        ]
+    lines.append(f"tradingscreen_fetch_coalesced_total {_loads.shared}")
+    return lines
+
+
+# Concurrent loads of the same bars share one download + clean pass
+_loads = SingleFlight()
+
+register_metrics_source(scheduler_metrics)
+
+SCREENER_MARKETS = {
+    "BIST": "turkey",
+    "Forex": "forex",
+    "Crypto": "crypto",
+    "NASDAQ": "america",
+}
+
 
 def fetch_market_symbols(market):
     """Fetch symbols for given market"""
-    try:
-        if market == "BIST":
-            symbols = get_all_symbols(market="turkey")
-            return sorted([s.replace("BIST:", "") for s in symbols])
-        elif market == "Forex":
-            symbols = get_all_symbols(market="forex")
-            return sorted([s.replace("FX:", "") for s in symbols])
-        elif market == "Crypto":
-            symbols = get_all_symbols(market="crypto")
-            return sorted(
-                [s.replace("BINANCE:", "") for s in symbols if s.endswith("USDT")]
-            )
-        elif market == "NASDAQ":
-            symbols = get_all_symbols(market="america")
-            return sorted([s.replace("NASDAQ:", "") for s in symbols])
+    screener_market = SCREENER_MARKETS.get(market)
+    if screener_market is None:
         return []
+    try:
+        symbols = schedulers["screener"].call(
+            ("symbols", screener_market), get_all_symbols, market=screener_market
+        )
     except Exception as e:
+        # Arayüz boş listeyle devam eder, hata loglanır
+        logger.warning("Symbol list for %s unavailable: %s", market, e)
         return []
 
+    prefix = SYMBOL_PREFIXES[market]
+    if market == "Crypto":
+        symbols = [s for s in symbols if s.endswith("USDT")]
+    return sorted([s.replace(prefix, "") for s in symbols])
+
 
 def get_full_symbol(market, symbol):
     """Add exchange prefix to symbol"""
@@ -39,30 +88,7 @@ def is_market_open(timestamp, market):
     weekday = timestamp.weekday()
     current_time = timestamp.time()
 
-    market_hours = {
-        "BIST": {
-            "open": time(10, 0),
-            "close": time(18, 0),
-            "trading_days": range(0, 5),  # Monday to Friday
-        },
-        "NASDAQ": {
-            "open": time(9, 30),
-            "close": time(16, 0),
-            "trading_days": range(0, 5),
-        },
-        "Forex": {
-            "open": time(0, 0),
-            "close": time(23, 59),
-            "trading_days": range(0, 7),  # All week
-        },
-        "Crypto": {
-            "open": time(0, 0),
-            "close": time(23, 59),
-            "trading_days": range(0, 7),
-        },
-    }
-
-    market_schedule = market_hours.get(market)
+    market_schedule = MARKET_HOURS.get(market)
     if not market_schedule:
         return True
 
@@ -72,29 +98,95 @@ def is_market_open(timestamp, market):
     )
 
 
+@profiled("clean_market_data")
 def clean_market_data(data, market):
-    """Clean market data by removing gaps"""
+    """Clean market data with the market's cleaning pipeline.
+
+    What changed is logged and kept in the result's attrs["cleaning"].
+    """
     if data is None or data.empty:
         return data
 
-    # Convert index to datetime
-    data.index = pd.to_datetime(data.index)
-
-    # Sort index
-    data = data.sort_index()
-
-    # Forward fill small gaps using recommended method
-    data = data.ffill(limit=3)
-
+    data, report = clean_bars(data, market)
+    logger.debug("Cleaned %s bars: %s", market, report)
     return data
 
 
 def fetch_market_data(symbol, exchange, interval, n_bars=2500):
-    """Fetch and clean market data from TvDatafeed"""
-    data = tv.get_hist(
-        symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars
+    """Fetch and clean market data from TvDatafeed.
+
+    Callers asking for the same bars at the same time get the same DataFrame,
+    so treat the result as read-only (copy before modifying it).
+    """
+    return _loads.do(
+        (symbol, exchange, str(interval), n_bars),
+        _fetch_market_data,
+        symbol,
+        exchange,
+        interval,
+        n_bars,
+    )
+
+
+@profiled("fetch_market_data")
+def _fetch_market_data(symbol, exchange, interval, n_bars):
+    data = schedulers["tvdatafeed"].call(
+        ("get_hist", symbol, exchange, interval, n_bars),
+        tv.get_hist,
+        symbol=symbol,
+        exchange=exchange,
+        interval=interval,
+        n_bars=n_bars,
     )
 
     if data is not None and not data.empty:
-        return clean_market_data(data, exchange)
+        return clean_market_data(data, EXCHANGE_MARKETS.get(exchange, exchange))
     return data
+
+
+def load_dataset(full_symbol, exchange, interval, timeframe, history_range=None):
+    """Get a handle to the shared dataset, fetching it if no session has it.
+
+    Every fetch is added to the bar archive; with `history_range` the
+    dataset is the archived (start, end) window instead of the latest bars.
+    """
+
+    def loader():
+        data = fetch_market_data(full_symbol, exchange, interval)
+        if data is None or data.empty:
+            return None
+        bars = Bars.from_frame(data, full_symbol)
+        append_bars(bars, timeframe)
+        return bars
+
+    key = dataset_key(full_symbol, exchange, interval)
+    latest = acquire(key, loader)
+    if history_range is None:
+        return latest
+
+    start, end = history_range
+    return acquire(
+        key + (start, end), lambda: read_range(full_symbol, timeframe, start, end)
+    )
+
+
+def load_archived_bars(market, symbol, timeframe):
+    """Archived bars of `symbol`, fetched (and archived) first when missing or
+    more than one interval old. A failed refetch falls back to the archive.
+    """
+    full_symbol = get_full_symbol(market, symbol)
+    bars = read_range(full_symbol, timeframe)
+    if bars is None or is_stale(bars, timeframe):
+        try:
+            data = fetch_market_data(
+                full_symbol, EXCHANGE_MAPPINGS.get(market), get_interval(timeframe)
+            )
+        except Exception as e:
+            if bars is None:
+                raise
+            logger.warning("Refetch of %s failed, using the archive: %s", symbol, e)
+            data = None
+        if data is not None and not data.empty:
+            bars = Bars.from_frame(data, full_symbol)
+            append_bars(bars, timeframe)
+    return bars
@@ -0,0 +1,130 @@
+import heapq
+
+import numpy as np
+
+from .db_utils import close_orders, get_open_orders
+from .profiling import profiled
+from .trading import fill_order
+
+# UI label -> (side, order_type)
+ORDER_TYPES = {
+    "Limit Buy": ("BUY", "LIMIT"),
+    "Limit Sell": ("SELL", "LIMIT"),
+    "Stop Buy": ("BUY", "STOP"),
+    "Stop-Loss (Sell)": ("SELL", "STOP"),
+}
+
+
+def _first_at_or_below(lows, prices):
+    """Index of the first bar whose low reaches each price (len(lows) if none)"""
+    running = -np.minimum.accumulate(lows)  # Non-decreasing, so searchable
+    return np.searchsorted(running, -prices, side="left")
+
+
+def _first_at_or_above(highs, prices):
+    """Index of the first bar whose high reaches each price (len(highs) if none)"""
+    return np.searchsorted(np.maximum.accumulate(highs), prices, side="left")
+
+
+def match_orders(orders, bars, start, stop):
+    """Match working orders against bars [start, stop) in one vectorized pass.
+
+    An order only sees bars after the one it was placed on. Buy limits and
+    sell stops trigger when the low reaches the price, sell limits and buy
+    stops when the high does; a bar that gaps through the price fills at
+    its open. Returns (trigger positions, fill prices, filled mask) with
+    positions relative to `bars`.
+    """
+    window = bars.view(stop, start)
+    n = len(window)
+    count = len(orders)
+    trigger = np.full(count, n)
+    if n == 0 or count == 0:
+        return trigger + start, np.full(count, np.nan), trigger < n
+
+    # Compare in the bars' dtype so a float32 low equals a limit of the same tick
+    prices = orders["price"].to_numpy(dtype=np.float64)
+    thresholds = prices.astype(window.low.dtype)
+    below = (
+        ((orders["side"] == "BUY") & (orders["order_type"] == "LIMIT"))
+        | ((orders["side"] == "SELL") & (orders["order_type"] == "STOP"))
+    ).to_numpy()
+
+    placed_at = orders["chart_timestamp"]
+    placed = placed_at.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    placed = np.where(placed_at.isna(), np.iinfo(np.int64).min, placed)
+    first_eligible = np.searchsorted(window.timestamps, placed, side="right")
+
+    # Orders placed before the window share one running min/max
+    for first in np.unique(first_eligible):
+        if first >= n:
+            continue
+        group = first_eligible == first
+        low_group = group & below
+        high_group = group & ~below
+        trigger[low_group] = first + _first_at_or_below(
+            window.low[first:], thresholds[low_group]
+        )
+        trigger[high_group] = first + _first_at_or_above(
+            window.high[first:], thresholds[high_group]
+        )
+
+    filled = trigger < n
+    opens = window.open[np.minimum(trigger, n - 1)].astype(np.float64)
+    gap_through = np.where(below, opens < prices, opens > prices)
+    fill_prices = np.where(filled & gap_through, opens, prices)
+    fill_prices[~filled] = np.nan
+    return trigger + start, fill_prices, filled
+
+
+@profiled("orders.process_orders")
+def process_orders(user_id, symbol, market, bars, start, stop):
+    """Fill the user's working orders crossed while the cutoff moved start -> stop.
+
+    Fills are executed in bar order (a heap keyed by trigger position) so each
+    one sees the balance and position left by the previous fills. Returns
+    (trade markers, rejection messages).
+    """
+    if stop <= start:
+        return [], []
+    orders = get_open_orders(user_id, symbol, market)
+    if orders.empty:
+        return [], []
+
+    trigger, fill_prices, filled = match_orders(orders, bars, start, stop)
+    order_ids = orders["id"].to_numpy()
+    heap = [(int(trigger[i]), int(order_ids[i]), i) for i in np.flatnonzero(filled)]
+    heapq.heapify(heap)
+
+    trades, rejections, updates = [], [], []
+    while heap:
+        position, order_id, i = heapq.heappop(heap)
+        order = orders.iloc[i]
+        timestamp = bars.timestamp(position)
+        # Gap fills use the bar's open as stored, limits the user's price
+        price = (
+            bars.price(position, "open")
+            if fill_prices[i] != order["price"]
+            else float(order["price"])
+        )
+        try:
+            trade = fill_order(
+                order_id,
+                order["side"],
+                user_id,
+                symbol,
+                market,
+                float(order["quantity"]),
+                price,
+                timestamp,
+            )
+        except ValueError as e:
+            updates.append(("REJECTED", None, timestamp, order_id))
+            rejections.append(f"Order #{order_id} rejected: {e}")
+        else:
+            # None: another session filled it first
+            if trade is not None:
+                trades.append(trade)
+
+    close_orders(updates)
+    return trades, rejections
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .archive import latest_close
+from .config import EXCHANGE_MAPPINGS, PORTFOLIO_PRICE_WORKERS
+from .dataset_store import latest_bars
+from .db_utils import get_positions, get_user_balance
+from .intervals import get_interval
+from .market_data import fetch_market_data, get_full_symbol
+from .profiling import profiled
+
+
+def lookup_price(symbol, market, fetch_missing=True):
+    """Latest close for a symbol from loaded datasets, the archive or a fetch"""
+    full_symbol = get_full_symbol(market, symbol)
+
+    bars = latest_bars(full_symbol)
+    archived = latest_close(full_symbol)
+    if bars is not None and (archived is None or bars.timestamps[-1] >= archived[0]):
+        return bars.price(-1)
+    if archived is not None:
+        return archived[1]
+
+    if fetch_missing:
+        data = fetch_market_data(
+            full_symbol, EXCHANGE_MAPPINGS.get(market), get_interval("1m"), n_bars=1
+        )
+        if data is not None and not data.empty:
+            return float(data["close"].iloc[-1])
+    return np.nan
+
+
+@profiled("portfolio.lookup_prices")
+def lookup_prices(positions, overrides=None, fetch_missing=True):
+    """Prices for every (symbol, market) pair, looked up concurrently"""
+    overrides = overrides or {}
+    pairs = list(dict.fromkeys(zip(positions["symbol"], positions["market"])))
+    missing = [pair for pair in pairs if pair not in overrides]
+
+    prices = dict(overrides)
+    if missing:
+        with ThreadPoolExecutor(max_workers=PORTFOLIO_PRICE_WORKERS) as pool:
+            results = pool.map(
+                lambda pair: lookup_price(*pair, fetch_missing=fetch_missing), missing
+            )
+            prices.update(zip(missing, results))
+    return prices
+
+
+@profiled("portfolio.value_portfolio")
+def value_portfolio(user_id, overrides=None, fetch_missing=True):
+    """Mark every position to market.
+
+    `overrides` maps (symbol, market) to a price that takes precedence over
+    the cache, e.g. the replay cutoff close of the symbol being viewed.
+    Returns a dict with the valued positions, exposure per market and totals.
+    """
+    positions = get_positions(user_id)
+    cash = get_user_balance(user_id)
+
+    prices = lookup_prices(positions, overrides, fetch_missing)
+    keys = list(zip(positions["symbol"], positions["market"]))
+    positions["price"] = np.array([prices[key] for key in keys], dtype=float)
+    positions["market_value"] = positions["quantity"] * positions["price"]
+    positions["unrealized_pnl"] = positions["market_value"] - positions["total_cost"]
+    positions["unrealized_pct"] = (
+        positions["unrealized_pnl"] / positions["total_cost"].replace(0, np.nan) * 100
+    )
+
+    exposure = (
+        positions.groupby("market", as_index=False)[["total_cost", "market_value"]]
+        .sum(min_count=1)
+        .sort_values("market_value", ascending=False)
+    )
+    invested = positions["market_value"].sum()
+    exposure["weight_pct"] = (
+        exposure["market_value"] / invested * 100 if invested else 0.0
+    )
+
+    return {
+        "positions": positions,
+        "exposure": exposure,
+        "cash": cash,
+        "invested": invested,
+        "unrealized_pnl": positions["unrealized_pnl"].sum(),
+        "equity": cash + invested,
+        "unpriced": positions.loc[positions["price"].isna(), "symbol"].tolist(),
+    }
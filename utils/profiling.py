@@ -0,0 +1,171 @@
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import PROFILING_BUCKETS
+
+logger = logging.getLogger("tradingscreen.profiling")
+
+# Timings of the rerun currently executing in this context (one per session thread)
+_rerun_timings = contextvars.ContextVar("rerun_timings", default=None)
+
+# Process-wide aggregates for the metrics export
+_totals_lock = threading.Lock()
+_totals = {}
+
+_metrics_server = None
+_metric_sources = []  # Callables returning extra exposition lines
+
+
+def _new_span_stats():
+    return {"count": 0, "total": 0.0, "max": 0.0}
+
+
+def _record(name, elapsed):
+    """Add one span duration to the rerun and process-wide aggregates"""
+    timings = _rerun_timings.get()
+    if timings is not None:
+        stats = timings.setdefault(name, _new_span_stats())
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+
+    with _totals_lock:
+        stats = _totals.get(name)
+        if stats is None:
+            stats = _totals[name] = {
+                "count": 0,
+                "total": 0.0,
+                "buckets": [0] * len(PROFILING_BUCKETS),
+            }
+        stats["count"] += 1
+        stats["total"] += elapsed
+        for i, bound in enumerate(PROFILING_BUCKETS):
+            if elapsed <= bound:
+                stats["buckets"][i] += 1
+
+
+@contextmanager
+def timed(name):
+    """Time the enclosed block as a span called `name`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+def profiled(name):
+    """Decorator form of `timed`"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_rerun():
+    """Begin collecting spans for a new script run"""
+    timings = {}
+    _rerun_timings.set(timings)
+    return timings
+
+
+def get_rerun_timings():
+    """Return {span: {count, total, max}} for the current script run"""
+    return _rerun_timings.get() or {}
+
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """Submit func to `executor` so its spans count toward the current rerun"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def log_rerun_timings(**context):
+    """Emit the current run's spans as one structured JSON log line"""
+    timings = get_rerun_timings()
+    if not timings:
+        return
+    record = {
+        "event": "rerun_timings",
+        "spans": {
+            name: {
+                "count": stats["count"],
+                "total_ms": round(stats["total"] * 1000, 3),
+                "max_ms": round(stats["max"] * 1000, 3),
+            }
+            for name, stats in timings.items()
+        },
+    }
+    record.update(context)
+    logger.info(json.dumps(record, default=str))
+
+
+def register_metrics_source(source):
+    """Include the lines returned by `source()` in the metrics export"""
+    _metric_sources.append(source)
+
+
+def export_prometheus():
+    """Render process-wide span totals in Prometheus text exposition format"""
+    lines = [
+        "# HELP tradingscreen_span_seconds Duration of instrumented hot-path spans",
+        "# TYPE tradingscreen_span_seconds histogram",
+    ]
+    with _totals_lock:
+        snapshot = {
+            name: (stats["count"], stats["total"], list(stats["buckets"]))
+            for name, stats in _totals.items()
+        }
+
+    for name in sorted(snapshot):
+        count, total, buckets = snapshot[name]
+        for bound, bucket_count in zip(PROFILING_BUCKETS, buckets):
+            lines.append(
+                f'tradingscreen_span_seconds_bucket{{span="{name}",le="{bound}"}} {bucket_count}'
+            )
+        lines.append(
+            f'tradingscreen_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}'
+        )
+        lines.append(f'tradingscreen_span_seconds_sum{{span="{name}"}} {total}')
+        lines.append(f'tradingscreen_span_seconds_count{{span="{name}"}} {count}')
+    for source in _metric_sources:
+        lines.extend(source())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port):
+    """Serve /metrics on `port` from a daemon thread (once per process)"""
+    global _metrics_server
+    with _totals_lock:
+        if _metrics_server is not None:
+            return _metrics_server
+        _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
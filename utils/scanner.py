@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import pandas as pd
+
+from .config import (
+    SCANNER_BARS,
+    SCANNER_FETCH_WORKERS,
+    SCANNER_TIME_BUDGET,
+    SCANNER_WORKERS,
+)
+from .market_data import load_archived_bars
+
+
+def _load_bars(market, symbol, timeframe):
+    """Recent bars of one symbol. Runs in this process, so every fetch goes
+    through the shared upstream scheduler.
+    """
+    bars = load_archived_bars(market, symbol, timeframe)
+    if bars is None:
+        return None
+    return bars.view(None, -SCANNER_BARS)
+
+
+def scan_symbol(indicator_name, symbol, timeframe, frame, lookback):
+    """Run one indicator on one symbol's bars; executed inside a worker process"""
+    from helpers.indicator_info import indicators
+
+    try:
+        signals = indicators[indicator_name](frame, symbol, timeframe)
+        if signals is None or signals.empty:
+            return None
+
+        signal_times = pd.to_datetime(
+            signals["Sinyal Tarihi"], format="%d.%m.%Y %H:%M"
+        )
+        since = frame.index[max(len(frame) - lookback, 0)]
+        recent = signals[signal_times >= since]
+        if recent.empty:
+            return None
+        latest = recent.iloc[-1]
+        return {
+            "symbol": symbol,
+            "signal": latest["Sinyal Türü"],
+            "signal_time": latest["Sinyal Tarihi"],
+            "price": latest["Son Fiyat"],
+            "last_close": float(frame["close"].iloc[-1]),
+        }
+    except Exception as e:
+        return {"symbol": symbol, "error": str(e)}
+
+
+def scan_market(
+    indicator_name,
+    market,
+    symbols,
+    timeframe,
+    lookback=5,
+    time_budget=SCANNER_TIME_BUDGET,
+    max_workers=SCANNER_WORKERS,
+):
+    """Scan `symbols`, yielding as each one finishes.
+
+    Bars are loaded by a thread pool in this process (one upstream rate limit
+    for the whole scan); indicators run in a process pool. Yields (result,
+    completed, total); result is None unless the symbol had a signal in its
+    last `lookback` bars. The scan stops once `time_budget` seconds have
+    passed and unfinished symbols are cancelled.
+    """
+    deadline = time.monotonic() + time_budget
+    total = len(symbols)
+    completed = 0
+    loader = ThreadPoolExecutor(
+        max_workers=SCANNER_FETCH_WORKERS, thread_name_prefix="scanner-load"
+    )
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        loads = {
+            loader.submit(_load_bars, market, symbol, timeframe): symbol
+            for symbol in symbols
+        }
+        pending = set(loads)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(
+                pending, timeout=remaining, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                symbol = loads.pop(future, None)
+                if symbol is None:
+                    completed += 1
+                    yield future.result(), completed, total
+                    continue
+
+                try:
+                    bars = future.result()
+                except Exception as e:
+                    completed += 1
+                    yield {"symbol": symbol, "error": str(e)}, completed, total
+                    continue
+                if bars is None or len(bars) == 0:
+                    completed += 1
+                    yield None, completed, total
+                    continue
+                pending.add(
+                    executor.submit(
+                        scan_symbol,
+                        indicator_name,
+                        symbol,
+                        timeframe,
+                        bars.to_frame(),
+                        lookback,
+                    )
+                )
+    finally:
+        loader.shutdown(wait=False, cancel_futures=True)
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,233 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from .config import (
+    UPSTREAM_BACKOFF,
+    UPSTREAM_FAILURE_THRESHOLD,
+    UPSTREAM_RESET_TIMEOUT,
+    UPSTREAM_RETRIES,
+)
+from .profiling import timed
+
+logger = logging.getLogger("tradingscreen.scheduler")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream that keeps failing"""
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {}  # key -> Future shared by identical calls
+        self.shared = 0  # Callers that joined another caller's call
+
+    def do(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs) unless a call for `key` is already running,
+        in which case wait for that call and return (or raise) its outcome
+        """
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.inflight[key]
+        return future.result()
+
+    def __len__(self):
+        return len(self.inflight)
+
+
+class TokenBucket:
+    """Allow `rate` calls per second on average with bursts up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Open after `threshold` consecutive failures, retry after `reset_timeout`"""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False  # A half-open trial call is in flight
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Closed: always. Half-open: only the first caller, as the trial call"""
+        with self.lock:
+            state = self.state
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return True
+            return state == "closed"
+
+    def abandon(self):
+        """Give up a trial call without an outcome, so another caller may try"""
+        with self.lock:
+            self.probing = False
+
+    def record(self, success):
+        with self.lock:
+            self.probing = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                # Failures stay above the threshold, so a failed half-open
+                # trial re-opens the circuit immediately
+                if self.failures >= self.threshold:
+                    self.opened_at = time.monotonic()
+
+
+class RequestScheduler:
+    """Rate-limited, coalescing, retrying gateway to one upstream service"""
+
+    def __init__(self, name, rate, burst, timeout, max_concurrency):
+        self.name = name
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(
+            UPSTREAM_FAILURE_THRESHOLD, UPSTREAM_RESET_TIMEOUT
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=f"upstream-{name}"
+        )
+        # A slot is held until the call really finishes, even after a timeout,
+        # so work is only submitted when a worker is free to start it
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.metrics = {
+            "queued": 0,
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "rejected": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.metrics[name] += amount
+
+    def call(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs), sharing the result with identical calls.
+
+        Calls with the same `key` made while one is in flight wait for that
+        call instead of issuing their own.
+        """
+        return self.flights.do(key, self._call_with_retries, func, args, kwargs)
+
+    def _call_with_retries(self, func, args, kwargs):
+        base, cap = UPSTREAM_BACKOFF
+        for attempt in range(UPSTREAM_RETRIES + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(f"{self.name} circuit is open")
+
+            self._count("queued")
+            try:
+                self.bucket.acquire()
+                acquired = self.slots.acquire(timeout=self.timeout)
+            finally:
+                self._count("queued", -1)
+            if not acquired:
+                # Every worker is stuck in an earlier call; not this call's failure
+                self.breaker.abandon()
+                self._count("rejected")
+                raise TimeoutError(f"{self.name} has no free worker")
+
+            start = time.perf_counter()
+            try:
+                future = self.executor.submit(func, *args, **kwargs)
+            except BaseException:
+                self.slots.release()
+                raise
+            future.add_done_callback(lambda _: self.slots.release())
+            try:
+                with timed(f"upstream.{self.name}"):
+                    result = future.result(timeout=self.timeout)
+            except Exception as e:
+                if isinstance(e, FutureTimeoutError):
+                    e = TimeoutError(
+                        f"{self.name} call timed out after {self.timeout}s"
+                    )
+                self.breaker.record(False)
+                self._count("failures")
+                if attempt == UPSTREAM_RETRIES:
+                    raise e
+                delay = min(cap, base * 2**attempt) * random.uniform(0.5, 1.0)
+                logger.warning(
+                    "%s call failed (%s), retrying in %.1fs", self.name, e, delay
+                )
+                self._count("retries")
+                time.sleep(delay)
+            else:
+                elapsed = time.perf_counter() - start
+                self.breaker.record(True)
+                with self.lock:
+                    self.metrics["requests"] += 1
+                    self.metrics["latency_total"] += elapsed
+                    self.metrics["latency_max"] = max(
+                        self.metrics["latency_max"], elapsed
+                    )
+                return result
+
+    def snapshot(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics["inflight"] = len(self.flights)
+            metrics["coalesced"] = self.flights.shared
+        metrics["circuit"] = self.breaker.state
+        return metrics
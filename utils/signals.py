@@ -0,0 +1,25 @@
+import pandas as pd
+from helpers.indicator_info import indicators
+
+from .profiling import timed
+
+
+def compute_indicator_signals(indicator_name, data, symbol, timeframe):
+    """Run an indicator on the bars and convert its rows to chart signals"""
+    with timed(f"indicator.{indicator_name}"):
+        signals_df = indicators[indicator_name](data.to_frame(), symbol, timeframe)
+    if signals_df is None or signals_df.empty:
+        return []
+
+    timestamps = pd.to_datetime(signals_df["Sinyal Tarihi"], format="%d.%m.%Y %H:%M")
+    return [
+        {
+            "timestamp": timestamp,
+            "price": price,
+            "type": signal_type,
+            "indicator": indicator_name,
+        }
+        for timestamp, price, signal_type in zip(
+            timestamps, signals_df["Son Fiyat"], signals_df["Sinyal Türü"]
+        )
+    ]
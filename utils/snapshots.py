@@ -0,0 +1,78 @@
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .bars import Bars
+from .config import SNAPSHOT_DIR
+from .profiling import profiled
+
+SNAPSHOT_ID = re.compile(r"^[0-9a-f]{12}$")
+
+# Marker list -> columnar arrays (field, dtype)
+MARKER_FIELDS = {
+    "trades": (("type", str), ("price", np.float64)),
+    "signals": (("type", str), ("price", np.float64), ("indicator", str)),
+}
+
+
+def snapshot_path(snapshot_id):
+    if not SNAPSHOT_ID.match(snapshot_id or ""):
+        raise ValueError(f"Invalid snapshot id {snapshot_id!r}")
+    return os.path.join(SNAPSHOT_DIR, snapshot_id)
+
+
+def _marker_arrays(name, markers):
+    arrays = {
+        f"{name}_timestamp": np.array(
+            [pd.Timestamp(m["timestamp"]).value for m in markers], dtype=np.int64
+        )
+    }
+    for field, dtype in MARKER_FIELDS[name]:
+        arrays[f"{name}_{field}"] = np.array([m[field] for m in markers], dtype=dtype)
+    return arrays
+
+
+def _markers(name, arrays):
+    timestamps = pd.to_datetime(arrays[f"{name}_timestamp"])
+    columns = [arrays[f"{name}_{field}"].tolist() for field, _ in MARKER_FIELDS[name]]
+    return [
+        {"timestamp": timestamp, **dict(zip((f for f, _ in MARKER_FIELDS[name]), row))}
+        for timestamp, *row in zip(timestamps, *columns)
+    ]
+
+
+@profiled("snapshots.save")
+def save_snapshot(bars, trades, signals, **meta):
+    """Write a replay session to SNAPSHOT_DIR/<id> and return the id.
+
+    Bars go to one .npy per column (memory-mapped on restore), markers to a
+    columnar .npz and everything else (cutoff, MAs, layout...) to meta.json.
+    """
+    snapshot_id = uuid.uuid4().hex[:12]
+    path = snapshot_path(snapshot_id)
+    bars.save(os.path.join(path, "bars"))
+    np.savez(
+        os.path.join(path, "markers.npz"),
+        **_marker_arrays("trades", trades),
+        **_marker_arrays("signals", signals),
+    )
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, default=str)
+    return snapshot_id
+
+
+@profiled("snapshots.load")
+def load_snapshot(snapshot_id):
+    """Return (bars, trades, signals, meta); raises FileNotFoundError if missing"""
+    path = snapshot_path(snapshot_id)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    bars = Bars.load(os.path.join(path, "bars"))
+    with np.load(os.path.join(path, "markers.npz"), allow_pickle=False) as arrays:
+        trades = _markers("trades", arrays)
+        signals = _markers("signals", arrays)
+    return bars, trades, signals, meta
@@ -0,0 +1,35 @@
+import numpy as np
+
+from .config import STATS_ATR_PERIOD, STATS_VOLATILITY_BARS, STATS_VOLUME_BARS
+from .indicator_graph import node_values
+from .profiling import profiled
+
+# Statistic -> indicator graph node. The graph computes each series once per
+# dataset, so reading them at a new replay cutoff is a constant-time lookup.
+STATISTIC_NODES = {
+    "close": "close",
+    "volume": "volume",
+    "prev_session_close": ("prev_session_close",),
+    "atr": ("atr", STATS_ATR_PERIOD),
+    "volatility": ("rolling_std", ("log_return", "close"), STATS_VOLATILITY_BARS),
+    "vwap": ("session_vwap",),
+    "volume_rank": ("rolling_rank", "volume", STATS_VOLUME_BARS),
+}
+
+
+@profiled("rolling_statistics")
+def rolling_statistics(bars):
+    """Statistics as of the last bar of `bars` (pass a view to stop at a cutoff)"""
+    if len(bars) == 0:
+        return {}
+    values = {
+        name: float(node_values(bars, node_id)[-1])
+        for name, node_id in STATISTIC_NODES.items()
+    }
+    close, previous = values["close"], values.pop("prev_session_close")
+    values["daily_change_pct"] = (close / previous - 1) * 100
+    values["atr_pct"] = values["atr"] / close * 100
+    values["volatility_pct"] = values.pop("volatility") * 100
+    values["vwap_distance_pct"] = (close / values["vwap"] - 1) * 100
+    values["volume_percentile"] = values.pop("volume_rank") * 100
+    return values
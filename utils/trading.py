@@ -0,0 +1,127 @@
+from .db_utils import (
+    add_transaction,
+    adjust_user_balance,
+    claim_order,
+    get_asset,
+    get_user_balance,
+    update_asset,
+    write_transaction,
+)
+from .user_store import cache_balance
+
+
+def execute_buy(user_id, symbol, market, quantity, price, chart_timestamp):
+    """Buy at `price`, updating balance, transactions and the position.
+
+    All three are written in one transaction, so concurrent fills (order
+    book, API) never see or leave a half-applied trade. Returns the trade
+    marker dict; raises ValueError if it cannot be filled.
+    """
+    with write_transaction() as conn:
+        balance = _buy(conn, user_id, symbol, market, quantity, price, chart_timestamp)
+    cache_balance(user_id, balance)
+    return {"type": "BUY", "timestamp": chart_timestamp, "price": price}
+
+
+def _buy(conn, user_id, symbol, market, quantity, price, chart_timestamp):
+    """Apply a buy inside the caller's transaction; returns the new balance"""
+    if quantity <= 0:
+        raise ValueError("Please enter a quantity greater than 0!")
+    total_cost = quantity * price
+    if total_cost > get_user_balance(user_id, conn):
+        raise ValueError("Insufficient balance!")
+
+    existing_asset = get_asset(user_id, symbol, market, conn)
+    if existing_asset:
+        # Calculate new values for existing asset
+        new_quantity = existing_asset[0] + quantity
+        new_total_cost = existing_asset[2] + total_cost
+        new_avg_price = new_total_cost / new_quantity
+    else:
+        new_quantity = quantity
+        new_avg_price = price
+        new_total_cost = total_cost
+
+    balance = adjust_user_balance(user_id, -total_cost, conn)
+    add_transaction(
+        user_id,
+        symbol,
+        "BUY",
+        quantity,
+        price,
+        total_cost,
+        0,
+        market,
+        chart_timestamp,
+        conn,
+    )
+    update_asset(
+        user_id, symbol, new_quantity, new_avg_price, new_total_cost, market, conn
+    )
+    return balance
+
+
+def execute_sell(user_id, symbol, market, quantity, price, chart_timestamp):
+    """Sell at `price`, realizing P&L against the average cost"""
+    with write_transaction() as conn:
+        balance = _sell(conn, user_id, symbol, market, quantity, price, chart_timestamp)
+    cache_balance(user_id, balance)
+    return {"type": "SELL", "timestamp": chart_timestamp, "price": price}
+
+
+def _sell(conn, user_id, symbol, market, quantity, price, chart_timestamp):
+    """Apply a sell inside the caller's transaction; returns the new balance"""
+    if quantity <= 0:
+        raise ValueError("Please enter a quantity greater than 0!")
+    position = get_asset(user_id, symbol, market, conn)
+    if not position or position[0] <= 0:
+        raise ValueError("No position to sell!")
+    if quantity > position[0]:
+        raise ValueError("Quantity exceeds position!")
+
+    total_amount = quantity * price
+    profit_loss = (price - position[1]) * quantity
+
+    balance = adjust_user_balance(user_id, total_amount, conn)
+    add_transaction(
+        user_id,
+        symbol,
+        "SELL",
+        quantity,
+        price,
+        total_amount,
+        profit_loss,
+        market,
+        chart_timestamp,
+        conn,
+    )
+    update_asset(
+        user_id,
+        symbol,
+        position[0] - quantity,
+        position[1],
+        position[1] * (position[0] - quantity),
+        market,
+        conn,
+    )
+    return balance
+
+
+def execute_trade(side, *args):
+    return (execute_buy if side == "BUY" else execute_sell)(*args)
+
+
+def fill_order(order_id, side, user_id, symbol, market, quantity, price, timestamp):
+    """Fill a working order: the order is closed in the same transaction as
+    the trade, so concurrent order processing fills it at most once.
+
+    Returns the trade marker, or None if the order was no longer open;
+    raises ValueError (nothing written) if it cannot be filled.
+    """
+    apply = _buy if side == "BUY" else _sell
+    with write_transaction() as conn:
+        if not claim_order(order_id, "FILLED", price, timestamp, conn):
+            return None
+        balance = apply(conn, user_id, symbol, market, quantity, price, timestamp)
+    cache_balance(user_id, balance)
+    return {"type": side, "timestamp": timestamp, "price": price}
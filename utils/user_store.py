@@ -0,0 +1,68 @@
+import threading
+
+from .db_utils import (
+    adjust_user_balance,
+    get_or_create_user,
+    get_user_balance,
+    update_user_balance,
+)
+
+# In-process user cache shared by all sessions. Balances are written
+# through to the database, so the cache never holds unsaved state. Other
+# processes (API, load test) write too, so changes are applied as SQL
+# increments and the cache only stores what the database returned.
+_lock = threading.Lock()
+_ids = {}  # username -> user id
+_balances = {}  # user id -> balance
+
+
+def login(username):
+    """User id for `username`; hits the database only on first sight"""
+    with _lock:
+        user_id = _ids.get(username)
+        if user_id is not None:
+            return user_id
+
+    user_id, balance = get_or_create_user(username)
+    with _lock:
+        _ids[username] = user_id
+        _balances.setdefault(user_id, balance)
+    return user_id
+
+
+def get_balance(user_id):
+    with _lock:
+        balance = _balances.get(user_id)
+    if balance is None:
+        balance = get_user_balance(user_id)
+        with _lock:
+            balance = _balances.setdefault(user_id, balance)
+    return balance
+
+
+def set_balance(user_id, balance):
+    """Persist and cache a new balance"""
+    update_user_balance(user_id, balance)
+    cache_balance(user_id, balance)
+
+
+def adjust_balance(user_id, amount):
+    """Add `amount` (negative to debit) atomically in the database"""
+    balance = adjust_user_balance(user_id, amount)
+    cache_balance(user_id, balance)
+    return balance
+
+
+def cache_balance(user_id, balance):
+    """Remember a balance just committed to the database"""
+    with _lock:
+        _balances[user_id] = balance
+
+
+def invalidate(user_id=None):
+    """Forget cached balances, e.g. after the database was changed externally"""
+    with _lock:
+        if user_id is None:
+            _balances.clear()
+        else:
+            _balances.pop(user_id, None)